@@ -1,18 +1,48 @@
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup,Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters,CallbackQueryHandler, ContextTypes
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup,Update
+from telegram.error import BadRequest
+from telegram.ext import Application, CommandHandler, MessageHandler, filters,CallbackQueryHandler, ContextTypes, BaseUpdateProcessor, BasePersistence, PersistenceInput
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
 import os
 import csv
+import asyncio
+import argparse
+import sqlite3
+import threading
 import datetime
-import pandas as pd
 import glob
+import tomllib
+from typing import NamedTuple, Optional
+import io
+import json
+import bisect
+import time
+import sys
+import collections
+import cProfile
+import pstats
+import marshal
+import tracemalloc
+import zipfile
+import hashlib
+from contextlib import asynccontextmanager
+from functools import partial
+
+load_dotenv()
 
 # Holds Telegram file_ids for subsequent sends
 FILE_IDS = {}
-# Holds raw file for first upload
+# Holds the path of each file, opened only for its first upload
 FILE_CACHE = {}
+# Holds key -> asyncio.Lock held while that file uploads, so it uploads once
+UPLOAD_LOCKS = {}
+# Holds the sha256 (and the size/mtime it was computed for) of each file
+FILE_HASHES = {}
+# Where FILE_IDS are kept between restarts
+FILE_IDS_PATH = os.getenv("FILE_IDS_PATH", "data/file_ids.json")
+# Uploads of different files may finish together; one save at a time
+FILE_IDS_SAVE_LOCK = threading.Lock()
 
 THUMBNAILS = {
     "digital_access_steps_video": "./responses/thumbnails/Digital Access Thumbnail.jpeg",
@@ -50,31 +80,229 @@ Sending <b>{clean_ext.upper()}</b> files is not allowed in this group for securi
             
         except Exception as e:
             print(f"Error handling document: {e}")
+    elif update.effective_chat.type == "private" and context.user_data.get("state") == "WAITING_FOR_SEARCH":
+        await handle_search_document(update, context)
+
+# ===== METRICS =====
+# Prometheus text format on http://METRICS_LISTEN:METRICS_PORT/metrics, 0 turns it off
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8000"))
+# Histogram bucket upper bounds, in seconds
+METRIC_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def format_labels(label_names, values):
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(label_names, escaped))
+
+class Counter:
+    """Prometheus counter, one value per label set"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name, self.help_text, self.label_names = name, help_text, label_names
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in list(self.values.items()):
+            lines.append(f"{self.name}{{{format_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+class Histogram:
+    """Prometheus histogram of durations, one series per label set"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name, self.help_text, self.label_names = name, help_text, label_names
+        # Holds labels -> [count per bucket (+Inf last), observation count, sum]
+        self.series = {}
+
+    def observe(self, labels, seconds):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(METRIC_BUCKETS) + 1) + [0, 0.0]
+        series[bisect.bisect_left(METRIC_BUCKETS, seconds)] += 1
+        series[-2] += 1
+        series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in list(self.series.items()):
+            label_text = format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(METRIC_BUCKETS + ("+Inf",), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-2]}")
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-1]}")
+        return lines
+
+HANDLER_SECONDS = Histogram(
+    "anbesa_handler_duration_seconds", "Time spent in a handle_message route", ("route",)
+)
+HANDLER_ERRORS = Counter(
+    "anbesa_handler_errors_total", "handle_message routes that raised", ("route",)
+)
+MEDIA_SECONDS = Histogram(
+    "anbesa_media_send_duration_seconds", "Time to send a cached file, first upload or file_id reuse", ("key", "mode")
+)
+SEARCH_SECONDS = Histogram(
+    "anbesa_search_duration_seconds", "Time of search_phone_in_reports lookups", ("category",)
+)
+REPORT_SAVE_SECONDS = Histogram(
+    "anbesa_report_save_duration_seconds", "Time of save_report_to_file calls", ("report_type", "outcome")
+)
+METRICS = [HANDLER_SECONDS, HANDLER_ERRORS, MEDIA_SECONDS, SEARCH_SECONDS, REPORT_SAVE_SECONDS]
+
+def render_metrics():
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+async def answer_metrics_request(reader, writer):
+    try:
+        request_line = await reader.readline()
+        # Skip the headers
+        while (await reader.readline()).strip():
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, body = "200 OK", render_metrics().encode()
+        else:
+            status, body = "404 Not Found", b"Not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (ConnectionError, UnicodeDecodeError):
+        pass
+    finally:
+        writer.close()
+
+async def serve_metrics():
+    """Serve /metrics until cancelled"""
+    server = await asyncio.start_server(answer_metrics_request, METRICS_LISTEN, METRICS_PORT)
+    print(f"Metrics on http://{METRICS_LISTEN}:{METRICS_PORT}/metrics")
+    async with server:
+        await server.serve_forever()
 
 # ===== STORAGE LOGIC =====
-def save_report_to_file(name, phone, issue):
-    os.makedirs("reports", exist_ok=True)
-    current_date = datetime.datetime.now().strftime("%Y-%m-%d")
-    
+# Holds reports waiting for report_writer(); None until the bot runs
+REPORT_QUEUE = None
+# Flush after this many buffered rows or once the oldest waited this many seconds
+REPORT_FLUSH_ROWS = int(os.getenv("REPORT_FLUSH_ROWS", "50"))
+REPORT_FLUSH_INTERVAL = float(os.getenv("REPORT_FLUSH_INTERVAL", "2"))
+# Seconds without reports before the open daily files are closed
+REPORT_IDLE_CLOSE = float(os.getenv("REPORT_IDLE_CLOSE", "60"))
+# Holds daily report filename -> open file, reused across flushes
+REPORT_HANDLES = {}
+# Report types, as used in the reports/<type>_<date>.csv names
+REPORT_TYPES = ["Already_Existed_Phone", "Blocked_Users", "Automatically_Returning_to_Login_Screen", "General_Issues"]
+
+def get_report_type(issue):
     # Map issue names to clean filenames
     if "Phone" in issue:
-        filename = f"reports/Already_Existed_Phone_{current_date}.csv"
+        return "Already_Existed_Phone"
     elif "Blocked" in issue:
-        filename = f"reports/Blocked_Users_{current_date}.csv"
+        return "Blocked_Users"
     elif "Automatically Returning to Login Screen" in issue:
-        filename = f"reports/Automatically_Returning_to_Login_Screen_{current_date}.csv"
+        return "Automatically_Returning_to_Login_Screen"
     else:
-        filename = f"reports/General_Issues_{current_date}.csv"
-    timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-    row = [timestamp, name, phone]
-    file_exists = os.path.isfile(filename)
-    
-    with open(filename, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(["Time", "Customer Name", "Phone Number"])
-        writer.writerow(row)
-    print(f"Logged to daily CSV: {filename}")
+        return "General_Issues"
+
+# Holds report type -> normalized phones reported on REPORTED_TODAY_DATE
+REPORTED_TODAY = {}
+REPORTED_TODAY_DATE = None
+
+def load_reported_today(date):
+    """Rebuild REPORTED_TODAY from the reports stored for date"""
+    global REPORTED_TODAY, REPORTED_TODAY_DATE
+    REPORTED_TODAY = {report_type: STORAGE.reported_phones(report_type, date) for report_type in REPORT_TYPES}
+    REPORTED_TODAY_DATE = date
+
+def save_report_to_file(name, phone, issue):
+    """
+    Queue the report for report_writer(); never waits on the disk.
+    Returns False without queuing if the number was already reported today for this issue.
+    """
+    started = time.perf_counter()
+    now = datetime.datetime.now()
+    report = (get_report_type(issue), now.strftime("%Y-%m-%d"), now.strftime("%H:%M:%S"), name, phone)
+    if report[1] != REPORTED_TODAY_DATE:
+        # First report of a new day (or of this process)
+        load_reported_today(report[1])
+    seen = REPORTED_TODAY[report[0]]
+    key = normalize_ethiopian_phone(phone)
+    if key in seen:
+        REPORT_SAVE_SECONDS.observe((report[0], "duplicate"), time.perf_counter() - started)
+        return False
+    seen.add(key)
+    category = SOLVED_CATEGORY_BY_REPORT_TYPE.get(report[0])
+    if category is not None:
+        PENDING.add_reported(category, key, now.date().toordinal())
+    if REPORT_QUEUE is None:
+        # Not running under the bot's event loop: write straight away
+        STORAGE.write_reports([report])
+        STORAGE.release_handles()
+        REPORT_SAVE_SECONDS.observe((report[0], "written"), time.perf_counter() - started)
+        return True
+    REPORT_QUEUE.put_nowait(report)
+    REPORT_SAVE_SECONDS.observe((report[0], "queued"), time.perf_counter() - started)
+    return True
+
+async def report_writer():
+    """
+    Batch queued reports and flush them on size, time or shutdown.
+    A batch that fails to write is kept and tried again REPORT_FLUSH_INTERVAL later.
+    """
+    loop = asyncio.get_running_loop()
+    reports = []
+    deadline = None
+    flush = None
+    retrying = False
+    try:
+        while True:
+            timeout = deadline - loop.time() if reports else REPORT_IDLE_CLOSE
+            try:
+                async with asyncio.timeout(max(timeout, 0)):
+                    report = await REPORT_QUEUE.get()
+            except TimeoutError:
+                if not reports:
+                    await asyncio.to_thread(STORAGE.release_handles)
+                    continue
+            else:
+                reports.append(report)
+                if len(reports) == 1:
+                    deadline = loop.time() + REPORT_FLUSH_INTERVAL
+                # While retrying, only the deadline triggers the next attempt
+                if (retrying or len(reports) < REPORT_FLUSH_ROWS) and loop.time() < deadline:
+                    continue
+            pending, reports = reports, []
+            flush = asyncio.ensure_future(asyncio.to_thread(STORAGE.write_reports, pending))
+            try:
+                # Shielded so a shutdown cannot cut a flush in half
+                await asyncio.shield(flush)
+                retrying = False
+            except Exception:
+                logger.exception(f"Error writing {len(pending)} report(s), retrying in {REPORT_FLUSH_INTERVAL} s")
+                # The numbers are in REPORTED_TODAY already, so they could not be reported again
+                reports = pending + reports
+                deadline = loop.time() + REPORT_FLUSH_INTERVAL
+                retrying = True
+    finally:
+        # Shutdown: write whatever is still buffered or queued
+        if flush is not None and not flush.done():
+            await asyncio.wait([flush])
+            if flush.exception() is not None:
+                reports = pending + reports
+        while not REPORT_QUEUE.empty():
+            reports.append(REPORT_QUEUE.get_nowait())
+        try:
+            if reports:
+                STORAGE.write_reports(reports)
+        except Exception:
+            logger.exception(f"Error writing {len(reports)} report(s) at shutdown, they are lost: {reports}")
+        STORAGE.release_handles()
 
 def format_for_storage(phone):
     raw_input = str(phone).strip()
@@ -95,130 +323,952 @@ def format_for_storage(phone):
     # If it doesn't match Rule 1, 2, or 3 exactly, it is rejected
     return None
 
-def load_files():
-    files_to_load = {
-        "digital_ambassador_pdf": "./responses/Designation of Tech-Native.pdf",
-        "DBS_backoffice_updated_form_pdf":"./responses/DBS backoffice updated form 20022026.pdf",
-        "digital_access_steps_video": "./responses/Digital Access Steps.mp4",
-        "blocked_customer_video": "./responses/videos/Unlocking and Unblocking customer.mp4",
-        "Approve_of_Digital_Access_on_CBS_video": "./responses/videos/Approval of Digital Access on CBS (Manual Review).mp4",
+# PDFs and videos sent by the bot, by key
+MEDIA_FILES = {
+    "digital_ambassador_pdf": "./responses/Designation of Tech-Native.pdf",
+    "DBS_backoffice_updated_form_pdf":"./responses/DBS backoffice updated form 20022026.pdf",
+    "digital_access_steps_video": "./responses/Digital Access Steps.mp4",
+    "blocked_customer_video": "./responses/videos/Unlocking and Unblocking customer.mp4",
+    "Approve_of_Digital_Access_on_CBS_video": "./responses/videos/Approval of Digital Access on CBS (Manual Review).mp4",
 
-    }
+}
 
-    for key, path_str in files_to_load.items():
+def load_files():
+    for key, path_str in MEDIA_FILES.items():
         path = Path(path_str)
         if path.exists():
-            FILE_CACHE[key] = path.read_bytes()
-            print(f"Loaded {key} into memory")
+            FILE_CACHE[key] = path
+            print(f"Found {key}")
         else:
             print(f"File not found: {path}")
 
+def get_file_hash(key):
+    """sha256 of a cached file, read in chunks and only when it changed"""
+    path = FILE_CACHE[key]
+    stat = path.stat()
+    known = FILE_HASHES.get(key)
+    if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime_ns:
+        return known["sha256"]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    FILE_HASHES[key] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+    return FILE_HASHES[key]["sha256"]
+
+def load_file_ids():
+    """
+    Reuse the file_ids of earlier runs for files that did not change since,
+    if FILE_IDS_OWNER (the same bot on the same Bot API server) made them.
+    Every file is hashed here, at startup, so save_file_ids() after an upload only stats them.
+    """
+    try:
+        with open(FILE_IDS_PATH, encoding="utf-8") as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        saved = {}
+    except (OSError, ValueError) as e:
+        print(f"Error reading {FILE_IDS_PATH}: {e}")
+        saved = {}
+    files = saved.get("files", {})
+    for key, entry in files.items():
+        if key in FILE_CACHE and "size" in entry and "mtime" in entry:
+            FILE_HASHES[key] = {"size": entry["size"], "mtime": entry["mtime"], "sha256": entry["sha256"]}
+    if saved and any(saved.get(name) != value for name, value in FILE_IDS_OWNER.items()):
+        print(f"{FILE_IDS_PATH} is from another bot or Bot API server, files will be uploaded again")
+        files = {}
+    for key in FILE_CACHE:
+        sha256 = get_file_hash(key)
+        entry = files.get(key)
+        if entry is None:
+            continue
+        if entry.get("sha256") == sha256:
+            FILE_IDS[key] = entry["file_id"]
+            print(f"Reusing stored file_id for {key}")
+        else:
+            print(f"{key} changed on disk, it will be uploaded again")
+
+def save_file_ids():
+    """Store FILE_IDS; runs in a worker thread when called from a handler"""
+    with FILE_IDS_SAVE_LOCK:
+        # Copied under the lock, so a save never overwrites a later one with older ids
+        file_ids = dict(FILE_IDS)
+        saved = {}
+        for key, file_id in file_ids.items():
+            if key in FILE_CACHE:
+                get_file_hash(key)
+                saved[key] = dict(FILE_HASHES[key], file_id=file_id)
+        os.makedirs(os.path.dirname(FILE_IDS_PATH) or ".", exist_ok=True)
+        # Write aside and swap so a crash never leaves half a file
+        tmp_path = f"{FILE_IDS_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(dict(FILE_IDS_OWNER, files=saved), f, indent=2)
+        os.replace(tmp_path, FILE_IDS_PATH)
+
 load_files()
-load_dotenv()
 
 # normalize the phone number
 def normalize_ethiopian_phone(phone):
-    if not phone or pd.isna(phone):
+    if not phone:
         return ""
     clean_phone = ''.join(filter(str.isdigit, str(phone)))
     # Return the last 9 digits
     return clean_phone[-9:]
 
-# Search function
-def search_phone_in_reports(phone_number, category_prefix):
-    file_pattern = f"solved/{category_prefix}*.csv"
-    files = glob.glob(file_pattern)
+# ===== SOLVED ISSUES INDEX =====
+# Category prefixes used to name the files in solved/
+SOLVED_CATEGORIES = ["Phone Number Already Exists", "Blocked_Users", "Automatic Return"]
+# Report type -> solved/ category that closes it
+SOLVED_CATEGORY_BY_REPORT_TYPE = {
+    "Already_Existed_Phone": "Phone Number Already Exists",
+    "Blocked_Users": "Blocked_Users",
+    "Automatically_Returning_to_Login_Screen": "Automatic Return",
+}
+# A report is refused as "Already Fixed" only if the last fix is at most this many days old,
+# or if a solved/ file without a date in its name lists the number
+RECENT_FIX_DAYS = int(os.getenv("RECENT_FIX_DAYS", "7"))
+# Search category covering every entry of SOLVED_CATEGORIES
+ALL_CATEGORIES = "All categories"
+# Holds normalized 9-digit phone -> {category: sorted tuple of fix day ordinals},
+# so one lookup covers every category and the whole history of a number
+SOLVED_INDEX = {}
+# Holds solved/ file path -> what has been indexed from it so far
+SOLVED_FILES = {}
+# Seconds between two checks of solved/ for new or changed files
+SOLVED_WATCH_INTERVAL = float(os.getenv("SOLVED_WATCH_INTERVAL", "5"))
+
+def get_file_date(file):
+    # solved/Blocked_Users_2026-02-20.csv -> 2026-02-20
+    return os.path.basename(file).split('_')[-1].replace('.csv', '')
+
+def date_to_ordinal(date_part):
+    """2026-02-20 -> day ordinal, 0 when the file name has no valid date"""
+    try:
+        return datetime.date.fromisoformat(date_part).toordinal()
+    except ValueError:
+        return 0
 
-    if not files:
-        print(f"DEBUG: No files found for pattern: {file_pattern}")
-        return []
-    # Normalize the user input to 9 digits
-    target = normalize_ethiopian_phone(phone_number)
+def format_fix_date(ordinal):
+    return datetime.date.fromordinal(ordinal).isoformat() if ordinal else "date unknown"
+
+def fixed_since(dates, ordinal):
+    """True if one of the sorted fix dates is on or after ordinal; a fix of unknown date always is"""
+    return bool(dates) and (dates[0] == 0 or dates[-1] >= ordinal)
 
-    results = []
-    for file in files:
+def get_solved_category(file):
+    name = os.path.basename(file)
+    return next((c for c in SOLVED_CATEGORIES if name.startswith(c)), None)
+
+def read_solved_rows(file, offset=0, column=None, complete_lines_only=False):
+    """
+    Streams the CSV rows stored after byte `offset` and returns
+    (normalized phones, new offset, phone column, last bytes read).
+    """
+    phones = []
+    tail = b""
+    with open(file, "rb") as f:
+        f.seek(offset)
+
+        def lines():
+            nonlocal offset, tail
+            for line in f:
+                if complete_lines_only and not line.endswith(b"\n"):
+                    # Leave a half written last line for the next pass
+                    return
+                offset += len(line)
+                tail = (tail + line)[-64:]
+                yield line.decode("utf-8-sig" if offset == len(line) else "utf-8")
+
+        rows = csv.reader(lines())
+        if column is None:
+            # Same header handling as before: stripped names, "Phone Number" column
+            header = [c.strip() for c in next(rows, [])]
+            column = header.index("Phone Number")
+        for row in rows:
+            if len(row) > column:
+                key = normalize_ethiopian_phone(row[column])
+                if key:
+                    phones.append(key)
+    return phones, offset, column, tail
+
+def index_solved_file(file, stat):
+    """(Re)index a whole solved/ file"""
+    phones, offset, column, tail = read_solved_rows(file)
+    state = SOLVED_FILES[file] = {
+        "category": get_solved_category(file),
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "offset": offset,
+        "column": column,
+        "tail": tail,
+    }
+    STORAGE.store_solved(file, state, phones, replace=True)
+    return phones
+
+def append_solved_file(file, stat):
+    """Index only the bytes appended to a solved/ file since the last pass"""
+    state = SOLVED_FILES[file]
+    tail = state["tail"]
+    with open(file, "rb") as f:
+        f.seek(state["offset"] - len(tail))
+        same_start = f.read(len(tail)) == tail
+    if not same_start:
+        # The file was replaced rather than appended to
+        return index_solved_file(file, stat)
+    # Wait for a trailing line without newline until the file stops growing
+    stable = stat.st_size == state["size"]
+    phones, offset, _, new_tail = read_solved_rows(
+        file, state["offset"], state["column"], complete_lines_only=not stable
+    )
+    state.update(mtime=stat.st_mtime, size=stat.st_size, offset=offset, tail=(tail + new_tail)[-64:])
+    STORAGE.store_solved(file, state, phones, replace=False)
+    return phones
+
+def refresh_solved_index():
+    """
+    Brings the solved numbers in STORAGE up to date with solved/: new or
+    replaced files are indexed, grown files are read from where the last
+    pass stopped.
+    """
+    current = {}
+    for category in SOLVED_CATEGORIES:
+        for file in glob.glob(f"solved/{category}*.csv"):
+            current[file] = os.stat(file)
+
+    changed = 0
+    # Categories that may have lost numbers, their solved set is rebuilt
+    shrunk = set()
+    for file in list(SOLVED_FILES):
+        if file not in current:
+            state = SOLVED_FILES.pop(file)
+            STORAGE.drop_solved(file, state)
+            shrunk.add(state["category"])
+            changed += 1
+            print(f"Removed {file} from solved index")
+    for file, stat in current.items():
+        state = SOLVED_FILES.get(file)
         try:
-            df = pd.read_csv(file, dtype=str)
-            df.columns = [c.strip() for c in df.columns]
-            
-            # Now we compare normalized CSV vs normalized target (9 digits vs 9 digits)
-            match = df[df['Phone Number'].apply(lambda x: normalize_ethiopian_phone(str(x))) == target]
-            
-            if not match.empty:
-                for _, row in match.iterrows():
-                    date_part = os.path.basename(file).split('_')[-1].replace('.csv', '')
-                    results.append({
-                        "date": date_part,
-                        "status": "Fixed ✅"
-                    })
+            if state is None or stat.st_size < state["offset"]:
+                phones = index_solved_file(file, stat)
+            elif stat.st_size > state["offset"] or stat.st_mtime != state["mtime"]:
+                phones = append_solved_file(file, stat)
+            else:
+                continue
+            if state is not None and SOLVED_FILES[file] is not state:
+                # Indexed again from scratch: replaced, not appended to
+                shrunk.add(state["category"])
+            PENDING.add_solved(SOLVED_FILES[file]["category"], phones, date_to_ordinal(get_file_date(file)))
+            changed += 1
+            print(f"Indexed {file}: {len(phones)} numbers")
         except Exception as e:
             print(f"Error reading {file}: {e}")
-            
-    return results
+    for category in shrunk:
+        PENDING.rebuild_solved(category)
+    return changed
+
+async def watch_solved_files():
+    """Keep the solved numbers current while the bot runs"""
+    while True:
+        await asyncio.sleep(SOLVED_WATCH_INTERVAL)
+        try:
+            await asyncio.to_thread(refresh_solved_index)
+        except Exception as e:
+            print(f"Error refreshing solved index: {e}")
+
+# ===== STORAGE BACKENDS =====
+# "csv" (reports/ and solved/ files) or "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "csv")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "data/anbesa_bot.sqlite3")
+
+class CsvStorage:
+    """Daily CSVs in reports/, solved/ numbers kept in SOLVED_INDEX"""
+
+    def __init__(self):
+        # Holds solved/ file -> set of the numbers it holds
+        self.solved_phones = {}
+
+    def write_reports(self, reports):
+        os.makedirs("reports", exist_ok=True)
+        batches = {}
+        for report_type, date, time, name, phone in reports:
+            batches.setdefault(f"reports/{report_type}_{date}.csv", []).append([time, name, phone])
+        for filename, rows in batches.items():
+            f = REPORT_HANDLES.get(filename)
+            if f is None:
+                file_exists = os.path.isfile(filename)
+                f = REPORT_HANDLES[filename] = open(filename, "a", newline="", encoding="utf-8")
+                if not file_exists:
+                    csv.writer(f).writerow(["Time", "Customer Name", "Phone Number"])
+            try:
+                csv.writer(f).writerows(rows)
+                f.flush()
+            except OSError:
+                # Reopened on the retry instead of reusing a broken handle
+                REPORT_HANDLES.pop(filename).close()
+                raise
+            print(f"Logged {len(rows)} row(s) to daily CSV: {filename}")
+
+    def release_handles(self):
+        for filename in list(REPORT_HANDLES):
+            REPORT_HANDLES.pop(filename).close()
+
+    def count_reports(self, report_type, date):
+        filename = f"reports/{report_type}_{date}.csv"
+        if not os.path.isfile(filename):
+            return 0
+        with open(filename, newline="", encoding="utf-8-sig") as f:
+            return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+    def reported_phones(self, report_type, date):
+        filename = f"reports/{report_type}_{date}.csv"
+        if not os.path.isfile(filename):
+            return set()
+        try:
+            return set(read_solved_rows(filename)[0])
+        except ValueError as e:
+            print(f"Error reading {filename}: {e}")
+            return set()
+
+    def load_solved_files(self):
+        # Nothing survives a restart, everything gets indexed again
+        return {}
+
+    def store_solved(self, file, state, phones, replace):
+        category = state["category"]
+        # One int object per file, shared by all its numbers
+        ordinal = date_to_ordinal(get_file_date(file))
+        for key in phones:
+            categories = SOLVED_INDEX.setdefault(key, {})
+            dates = categories.get(category, ())
+            if ordinal not in dates:
+                categories[category] = tuple(sorted(dates + (ordinal,)))
+        if replace:
+            # The new numbers are in before the old ones go, so a search
+            # never misses a number the file still lists
+            stale = self.solved_phones.get(file, set()).difference(phones)
+            self.solved_phones[file] = set(phones)
+            self.forget_solved(stale, category, ordinal)
+        else:
+            self.solved_phones.setdefault(file, set()).update(phones)
+
+    def drop_solved(self, file, state):
+        self.forget_solved(self.solved_phones.pop(file, set()), state["category"], date_to_ordinal(get_file_date(file)))
+
+    def forget_solved(self, keys, category, ordinal):
+        """Remove the fix on ordinal from keys, except where another file of the category still has it"""
+        others = [
+            phones for other, phones in self.solved_phones.items()
+            if get_solved_category(other) == category and date_to_ordinal(get_file_date(other)) == ordinal
+        ]
+        for key in keys:
+            if any(key in phones for phones in others):
+                continue
+            categories = SOLVED_INDEX.get(key, {})
+            dates = categories.get(category, ())
+            if ordinal in dates:
+                dates = tuple(d for d in dates if d != ordinal)
+                if dates:
+                    categories[category] = dates
+                else:
+                    del categories[category]
+                    if not categories:
+                        del SOLVED_INDEX[key]
+
+    def search_solved(self, key):
+        return SOLVED_INDEX.get(key, {})
+
+    def solved_dates(self, category):
+        """{normalized phone: sorted fix day ordinals} of the numbers fixed in category"""
+        return {key: categories[category] for key, categories in list(SOLVED_INDEX.items()) if category in categories}
+
+    def reported_history(self):
+        """Yields (report type, date, normalized phones) of every daily report file"""
+        for file in sorted(glob.glob("reports/*_*.csv")):
+            report_type, date = os.path.basename(file)[:-len(".csv")].rsplit("_", 1)
+            try:
+                phones = read_solved_rows(file)[0]
+            except ValueError as e:
+                print(f"Error reading {file}: {e}")
+                continue
+            yield report_type, date, phones
+
+    def search_solved_many(self, keys):
+        return {key: SOLVED_INDEX[key] for key in keys if key in SOLVED_INDEX}
+
+class SqliteStorage:
+    """Reports and solved numbers in a WAL-mode SQLite database"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS reports (
+        category TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        name TEXT,
+        phone TEXT NOT NULL,
+        source TEXT
+    );
+    CREATE INDEX IF NOT EXISTS reports_category_phone ON reports (category, phone);
+    CREATE INDEX IF NOT EXISTS reports_category_date ON reports (category, date);
+    CREATE INDEX IF NOT EXISTS reports_source ON reports (source);
+
+    CREATE TABLE IF NOT EXISTS solved (
+        category TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        date TEXT NOT NULL,
+        source TEXT NOT NULL
+    );
+    -- phone first: serves lookups in one category and across all of them
+    DROP INDEX IF EXISTS solved_category_phone;
+    CREATE INDEX IF NOT EXISTS solved_phone_category ON solved (phone, category);
+    CREATE INDEX IF NOT EXISTS solved_category_date ON solved (category, date);
+    CREATE INDEX IF NOT EXISTS solved_source ON solved (source);
+
+    -- How far each solved/ file has been imported
+    CREATE TABLE IF NOT EXISTS solved_files (
+        path TEXT PRIMARY KEY,
+        category TEXT NOT NULL,
+        mtime REAL NOT NULL,
+        size INTEGER NOT NULL,
+        offset INTEGER NOT NULL,
+        phone_column INTEGER NOT NULL,
+        tail BLOB NOT NULL
+    );
+    """
+    # Rows written per transaction while indexing solved/, each one holds self.lock
+    CHUNK_ROWS = 1000
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        # Shared by the event loop and the writer thread, guarded by self.lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def write_reports(self, reports):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO reports (category, date, time, name, phone) VALUES (?, ?, ?, ?, ?)",
+                reports,
+            )
+        print(f"Logged {len(reports)} report(s) to {self.path}")
+
+    def release_handles(self):
+        pass
+
+    def count_reports(self, report_type, date):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM reports WHERE category = ? AND date = ?", (report_type, date)
+            ).fetchone()[0]
+
+    def reported_phones(self, report_type, date):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT phone FROM reports WHERE category = ? AND date = ?", (report_type, date)
+            ).fetchall()
+        return {normalize_ethiopian_phone(phone) for (phone,) in rows}
+
+    def load_solved_files(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, category, mtime, size, offset, phone_column, tail FROM solved_files"
+            ).fetchall()
+        return {
+            path: {"category": category, "mtime": mtime, "size": size,
+                   "offset": offset, "column": column, "tail": tail}
+            for path, category, mtime, size, offset, column, tail in rows
+        }
+
+    def store_solved(self, file, state, phones, replace):
+        """
+        Inserts CHUNK_ROWS rows per transaction, so searches on the event loop get the
+        lock in between. A replaced file's old rows go only once the new ones are in;
+        until then DISTINCT in the queries hides the doubles.
+        """
+        date_part = get_file_date(file)
+        phones = list(phones)
+        with self.lock:
+            # New rows get higher rowids than every row already there
+            last_old_row = self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM solved").fetchone()[0]
+        for start in range(0, len(phones), self.CHUNK_ROWS):
+            with self.lock, self.conn:
+                self.conn.executemany(
+                    "INSERT INTO solved (category, phone, date, source) VALUES (?, ?, ?, ?)",
+                    ((state["category"], key, date_part, file) for key in phones[start:start + self.CHUNK_ROWS]),
+                )
+        if replace:
+            self.delete_solved_rows(file, last_old_row)
+        # Recorded last: after a crash before this, the file is indexed again from scratch
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO solved_files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (file, state["category"], state["mtime"], state["size"],
+                 state["offset"], state["column"], state["tail"]),
+            )
 
-async def send_cached_file(update: Update, key: str, caption: str = "",parse_mode: str = None):
+    def drop_solved(self, file, state):
+        self.delete_solved_rows(file)
+        # Forgotten last: after a crash before this, the file is dropped again
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM solved_files WHERE path = ?", (file,))
+
+    def delete_solved_rows(self, file, last_row=None):
+        """Deletes the rows of file (up to rowid last_row), CHUNK_ROWS per transaction"""
+        if last_row is None:
+            last_row = sys.maxsize
+        while True:
+            with self.lock, self.conn:
+                deleted = self.conn.execute(
+                    "DELETE FROM solved WHERE rowid IN "
+                    "(SELECT rowid FROM solved WHERE source = ? AND rowid <= ? LIMIT ?)",
+                    (file, last_row, self.CHUNK_ROWS),
+                ).rowcount
+            if deleted < self.CHUNK_ROWS:
+                return
+
+    def search_solved(self, key):
+        return self.search_solved_many([key]).get(key, {})
+
+    def solved_dates(self, category):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT phone, date FROM solved WHERE category = ?", (category,)
+            ).fetchall()
+        dates = {}
+        for key, date_part in rows:
+            dates.setdefault(key, []).append(date_to_ordinal(date_part))
+        return {key: tuple(sorted(ordinals)) for key, ordinals in dates.items()}
+
+    def reported_history(self):
+        """Yields (report type, date, normalized phones) of every day with reports"""
+        with self.lock:
+            rows = self.conn.execute("SELECT category, date, phone FROM reports ORDER BY category, date").fetchall()
+        days = {}
+        for report_type, date, phone in rows:
+            days.setdefault((report_type, date), []).append(normalize_ethiopian_phone(phone))
+        for (report_type, date), phones in days.items():
+            yield report_type, date, phones
+
+    def search_solved_many(self, keys):
+        keys = list(keys)
+        found = {}
+        with self.lock:
+            # Stays below SQLite's limit on bound parameters
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT DISTINCT phone, category, date FROM solved WHERE phone IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                for key, category, date_part in rows:
+                    found.setdefault(key, {}).setdefault(category, set()).add(date_to_ordinal(date_part))
+        # Same shape as SOLVED_INDEX
+        return {
+            key: {category: tuple(sorted(dates)) for category, dates in categories.items()}
+            for key, categories in found.items()
+        }
+
+    def import_reports(self):
+        """Copy every reports/<type>_<date>.csv into the reports table"""
+        for file in sorted(glob.glob("reports/*_*.csv")):
+            report_type, date = os.path.basename(file)[:-len(".csv")].rsplit("_", 1)
+            with open(file, newline="", encoding="utf-8-sig") as f:
+                reader = csv.reader(f)
+                header = [c.strip() for c in next(reader, [])]
+                try:
+                    columns = [header.index(c) for c in ("Time", "Customer Name", "Phone Number")]
+                except ValueError:
+                    print(f"Skipping {file}: unexpected header {header}")
+                    continue
+                rows = [
+                    (report_type, date, *(row[i] for i in columns), file)
+                    for row in reader if len(row) == len(header)
+                ]
+            with self.lock, self.conn:
+                # Importing a file again replaces what it brought last time
+                self.conn.execute("DELETE FROM reports WHERE source = ?", (file,))
+                self.conn.executemany(
+                    "INSERT INTO reports (category, date, time, name, phone, source) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            print(f"Imported {len(rows)} report(s) from {file}")
+
+STORAGE = CsvStorage()
+
+def open_storage():
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteStorage(SQLITE_PATH)
+    return CsvStorage()
+
+def import_csv_history():
+    """One-shot import of the reports/ and solved/ CSV history into SQLite"""
+    global STORAGE
+    STORAGE = SqliteStorage(SQLITE_PATH)
+    STORAGE.import_reports()
+    SOLVED_FILES.update(STORAGE.load_solved_files())
+    refresh_solved_index()
+    print(f"CSV history imported into {SQLITE_PATH}")
+
+# ===== PENDING REPORTS =====
+# Stands for a fix of unknown date, later than any report
+UNKNOWN_FIX = datetime.date.max.toordinal()
+
+def last_fix(dates):
+    """Day ordinal of the latest of the sorted fix dates; a fix of unknown date covers every report"""
+    return UNKNOWN_FIX if dates[0] == 0 else dates[-1]
+
+class Reconciliation:
     """
-    Sends a cached file (PDF, video, etc.) using Telegram file_id if available.
+    Report dates and latest fix per number and solved/ category, kept in
+    memory: a report is pending while no fix is dated after it.
     """
-    if key not in FILE_CACHE:
-        await update.message.reply_text(f"File '{key}' not found in cache.")
-        return
 
-    # Determine if file is PDF or Video
-    is_pdf = key.endswith("pdf")
-    is_video = key.endswith("video") or key.endswith("mov")
+    def __init__(self):
+        # Holds category -> {normalized phone: sorted day ordinals of its reports}
+        self.reported = {category: {} for category in SOLVED_CATEGORIES}
+        # Holds category -> {normalized phone: day ordinal of its latest fix}
+        self.solved = {category: {} for category in SOLVED_CATEGORIES}
+        # refresh_solved_index() updates the solved side from a worker thread
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Build both sides from STORAGE"""
+        reported = {category: {} for category in SOLVED_CATEGORIES}
+        for report_type, date, phones in STORAGE.reported_history():
+            category = SOLVED_CATEGORY_BY_REPORT_TYPE.get(report_type)
+            if category is None:
+                continue
+            ordinal = date_to_ordinal(date)
+            days = reported[category]
+            for key in phones:
+                days.setdefault(key, set()).add(ordinal)
+        reported = {
+            category: {key: tuple(sorted(ordinals)) for key, ordinals in days.items()}
+            for category, days in reported.items()
+        }
+        solved = {category: self.latest_fixes(category) for category in SOLVED_CATEGORIES}
+        with self.lock:
+            self.reported, self.solved = reported, solved
+        print(f"Pending reports: {sum(len(self.pending(c)) for c in SOLVED_CATEGORIES)}")
+
+    @staticmethod
+    def latest_fixes(category):
+        return {key: last_fix(dates) for key, dates in STORAGE.solved_dates(category).items()}
+
+    def add_reported(self, category, key, ordinal):
+        with self.lock:
+            days = self.reported[category].get(key, ())
+            if ordinal not in days:
+                self.reported[category][key] = tuple(sorted(days + (ordinal,)))
+
+    def add_solved(self, category, keys, ordinal):
+        fix = last_fix((ordinal,))
+        with self.lock:
+            solved = self.solved[category]
+            for key in keys:
+                if solved.get(key, -1) < fix:
+                    solved[key] = fix
+
+    def rebuild_solved(self, category):
+        fixes = self.latest_fixes(category)
+        with self.lock:
+            self.solved[category] = fixes
+
+    @staticmethod
+    def first_report_after(days, fix):
+        """First of the sorted report days after the fix (None: never fixed), else None"""
+        if fix is None:
+            return days[0]
+        i = bisect.bisect_right(days, fix)
+        return days[i] if i < len(days) else None
+
+    def pending(self, category):
+        """{phone: day ordinal of its first report since the latest fix} of the numbers waiting for a fix"""
+        with self.lock:
+            solved = self.solved[category]
+            pending = {
+                key: self.first_report_after(days, solved.get(key))
+                for key, days in self.reported[category].items()
+            }
+        return {key: since for key, since in pending.items() if since is not None}
+
+    def pending_since(self, key, category):
+        """Day ordinal of the first report since the latest fix of key, None if nothing is pending"""
+        with self.lock:
+            days = self.reported[category].get(key)
+            if days is None:
+                return None
+            return self.first_report_after(days, self.solved[category].get(key))
+
+PENDING = Reconciliation()
+
+def get_pending_categories(key, category):
+    """{category: day ordinal of the first report since the last fix} for the searched categories still open for key"""
+    categories = SOLVED_CATEGORIES if category == ALL_CATEGORIES else [category]
+    found = {}
+    for c in categories:
+        if c in PENDING.reported:
+            since = PENDING.pending_since(key, c)
+            if since is not None:
+                found[c] = since
+    return found
+
+def format_pending_since(ordinal):
+    days = datetime.date.today().toordinal() - ordinal
+    return f"{format_fix_date(ordinal)} ({days} day{'s' if days != 1 else ''})"
 
-    # First upload — store Telegram file_id
-    if key not in FILE_IDS:
-        if is_pdf:
-            msg = await update.message.reply_document(
-                document=FILE_CACHE[key],
+# Search function
+def search_phone_in_reports(phone_number, category_prefix):
+    if category_prefix != ALL_CATEGORIES and category_prefix not in SOLVED_CATEGORIES:
+        print(f"DEBUG: Unknown search category: {category_prefix}")
+        return []
+    started = time.perf_counter()
+    # Normalize the user input to 9 digits
+    target = normalize_ethiopian_phone(phone_number)
+
+    found = [
+        {"category": category, "date": format_fix_date(ordinal), "status": "Fixed ✅"}
+        for category, dates in STORAGE.search_solved(target).items()
+        if category_prefix in (ALL_CATEGORIES, category)
+        for ordinal in dates
+    ]
+    SEARCH_SECONDS.observe((category_prefix,), time.perf_counter() - started)
+    return found
+
+# Most numbers one bulk search may contain, and the largest file accepted for it
+BULK_SEARCH_LIMIT = int(os.getenv("BULK_SEARCH_LIMIT", "1000"))
+BULK_SEARCH_MAX_BYTES = int(os.getenv("BULK_SEARCH_MAX_BYTES", str(1024 * 1024)))
+
+def read_bulk_phones(text):
+    """Numbers from a pasted list or CSV: the column named like "Phone", else the first one"""
+    rows = [row for row in csv.reader(text.splitlines()) if any(cell.strip() for cell in row)]
+    column = 0
+    if rows:
+        phone_columns = [i for i, cell in enumerate(rows[0]) if "phone" in cell.lower()]
+        if phone_columns:
+            column = phone_columns[0]
+            rows = rows[1:]
+    return [row[column].strip() if len(row) > column else "" for row in rows]
+
+def search_phones_bulk(phone_numbers, category):
+    """
+    Normalizes all numbers, then looks them up together;
+    returns [(input, key, {category: fix dates}, {category: pending since})]
+    """
+    keys = [normalize_ethiopian_phone(phone) for phone in phone_numbers]
+    found = STORAGE.search_solved_many({key for key in keys if len(key) >= 7})
+    return [
+        (
+            phone, key,
+            {c: dates for c, dates in found.get(key, {}).items() if category in (ALL_CATEGORIES, c)},
+            get_pending_categories(key, category) if len(key) >= 7 else {},
+        )
+        for phone, key in zip(phone_numbers, keys)
+    ]
+
+def render_bulk_results(results):
+    """One CSV row per searched number and category it was fixed in"""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["Input", "Phone Number", "Status", "Category", "Fix Dates", "Pending Since"])
+    for phone, key, found, pending in results:
+        if len(key) < 7:
+            writer.writerow([phone, "", "Invalid number", "", "", ""])
+        elif not found and not pending:
+            writer.writerow([phone, f"0{key}", "Not found", "", "", ""])
+        for category, dates in found.items():
+            writer.writerow([
+                phone, f"0{key}", "Fixed", category.replace("_", " "),
+                " ".join(format_fix_date(d) for d in dates), ""
+            ])
+        for category, since in pending.items():
+            writer.writerow([phone, f"0{key}", "Pending", category.replace("_", " "), "", format_fix_date(since)])
+    # BOM so Excel shows the file as UTF-8
+    return out.getvalue().encode("utf-8-sig")
+
+async def upload_cached_file(send_document, send_video, key: str, caption: str = "", parse_mode: str = None):
+    """
+    Uploads a cached file with its thumbnail and stores the Telegram file_id.
+    send_document/send_video are e.g. message.reply_document or a bot method bound to a chat.
+    Returns the file_id, or None without sending when another caller uploaded the file meanwhile.
+    """
+    async with UPLOAD_LOCKS.setdefault(key, asyncio.Lock()):
+        if key in FILE_IDS:
+            return None
+        await upload_file(send_document, send_video, key, caption, parse_mode)
+        file_id = FILE_IDS[key]
+    await asyncio.to_thread(save_file_ids)
+    return file_id
+
+async def upload_file(send_document, send_video, key, caption, parse_mode):
+    if key.endswith("pdf"):
+        with open(FILE_CACHE[key], "rb") as document:
+            msg = await send_document(
+                document=document,
                 filename=f"{key}.pdf",
                 caption=caption,
                 parse_mode=parse_mode
             )
-            FILE_IDS[key] = msg.document.file_id
-        elif is_video:
-            thumbnail_path = THUMBNAILS.get(key)
+        FILE_IDS[key] = msg.document.file_id
+    else:
+        thumbnail_path = THUMBNAILS.get(key)
+        with open(FILE_CACHE[key], "rb") as video:
             if thumbnail_path and Path(thumbnail_path).exists():
                 with open(thumbnail_path, "rb") as thumb:
-                    msg = await update.message.reply_video(
-                        video=FILE_CACHE[key],
+                    msg = await send_video(
+                        video=video,
                         caption=caption,
                         thumbnail=thumb,
                         supports_streaming=True,
-                        parse_mode=parse_mode, 
-            )
+                        parse_mode=parse_mode,
+                    )
             else:
-                msg = await update.message.reply_video(
-                video=FILE_CACHE[key] if key not in FILE_IDS else FILE_IDS[key],
-                caption=caption,
-                supports_streaming=True,
-                parse_mode=parse_mode,
+                msg = await send_video(
+                    video=video,
+                    caption=caption,
+                    supports_streaming=True,
+                    parse_mode=parse_mode,
+                )
+        FILE_IDS[key] = msg.video.file_id
+
+async def send_cached_file(update: Update, key: str, caption: str = "",parse_mode: str = None):
+    """
+    Sends a cached file (PDF, video, etc.) using Telegram file_id if available.
+    """
+    if key not in FILE_CACHE:
+        await update.message.reply_text(f"File '{key}' not found in cache.")
+        return
+
+    started = time.perf_counter()
+    mode = "file_id" if key in FILE_IDS else "upload"
+    try:
+        await send_file(update, key, caption, parse_mode)
+    finally:
+        MEDIA_SECONDS.observe((key, mode), time.perf_counter() - started)
+
+async def send_file(update: Update, key: str, caption: str, parse_mode: str):
+    # Determine if file is PDF or Video
+    is_pdf = key.endswith("pdf")
+    is_video = key.endswith("video") or key.endswith("mov")
+
+    if not (is_pdf or is_video):
+        await update.message.reply_text("Unsupported file type.")
+        return
+
+    # First upload — stream the file from disk and store Telegram file_id
+    if key not in FILE_IDS:
+        if await upload_cached_file(
+            update.message.reply_document, update.message.reply_video,
+            key, caption=caption, parse_mode=parse_mode
+        ) is not None:
+            return
+        # Someone else's upload finished first, its file_id is used below
+
+    # Reuse Telegram file_id — instant
+    file_id = FILE_IDS[key]
+    try:
+        await send_file_id(update, is_pdf, file_id, caption, parse_mode)
+    except BadRequest as e:
+        # Not a file_id of this bot after all: forget it and upload the file again
+        print(f"file_id of {key} refused ({e}), uploading it again")
+        if FILE_IDS.get(key) == file_id:
+            del FILE_IDS[key]
+        if await upload_cached_file(
+            update.message.reply_document, update.message.reply_video,
+            key, caption=caption, parse_mode=parse_mode
+        ) is None:
+            await send_file_id(update, is_pdf, FILE_IDS[key], caption, parse_mode)
+
+async def send_file_id(update: Update, is_pdf: bool, file_id: str, caption: str, parse_mode: str):
+    if is_pdf:
+        await update.message.reply_document(
+            document=file_id,
+            caption=caption,
+            parse_mode=parse_mode
         )
-            FILE_IDS[key] = msg.video.file_id
-        else:
-            await update.message.reply_text("Unsupported file type.")
     else:
-        # Reuse Telegram file_id — instant
-        if is_pdf:
-            await update.message.reply_document(
-                document=FILE_IDS[key],
-                caption=caption,
-                parse_mode=parse_mode
-            )
-        elif is_video:
-            await update.message.reply_video(
-                video=FILE_IDS[key],
-                caption=caption,
-                supports_streaming=True,
-                parse_mode=parse_mode
-            )
-        else:
-            await update.message.reply_text("Unsupported file type.")
+        await update.message.reply_video(
+            video=file_id,
+            caption=caption,
+            supports_streaming=True,
+            parse_mode=parse_mode
+        )
 
 # ===== BOT CONFIGURATION =====
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Telegram user ids allowed to run admin commands, comma separated
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+# Chat that receives the warm-up uploads, and how many run at once
+CACHE_CHAT_ID = os.getenv("CACHE_CHAT_ID")
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "2"))
+# How updates reach the bot: "polling" or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Public HTTPS URL of the reverse proxy; it forwards WEBHOOK_PATH to WEBHOOK_LISTEN:WEBHOOK_PORT
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+# Sent back by Telegram in X-Telegram-Bot-Api-Secret-Token; other requests get 403
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Bot API server the bot talks to, e.g. a local one for load tests; the token is appended
+BOT_API_BASE_URL = os.getenv("BOT_API_BASE_URL", "https://api.telegram.org/bot")
+BOT_API_BASE_FILE_URL = os.getenv("BOT_API_BASE_FILE_URL", "https://api.telegram.org/file/bot")
+# A file_id only works for the bot that got it, on the server that gave it; the bot id
+# is the part of the token before ":". Saved file_ids of any other are not reused.
+FILE_IDS_OWNER = {"bot_id": (BOT_TOKEN or "").split(":")[0], "base_url": BOT_API_BASE_URL}
+load_file_ids()
+
+def is_admin(update: Update):
+    return update.effective_user is not None and update.effective_user.id in ADMIN_IDS
+
+# ===== MEDIA WARM-UP =====
+async def warm_up_media(bot: Bot, chat_id):
+    """
+    Uploads every cached file that has no file_id yet to chat_id, so users
+    only ever get instant file_id sends. Returns {key: error or None}.
+    """
+    semaphore = asyncio.Semaphore(WARMUP_CONCURRENCY)
+
+    async def upload(key):
+        async with semaphore:
+            try:
+                await upload_cached_file(
+                    partial(bot.send_document, chat_id), partial(bot.send_video, chat_id), key
+                )
+                print(f"Warmed up {key}")
+                return None
+            except Exception as e:
+                print(f"Error warming up {key}: {e}")
+                return e
+
+    keys = [key for key in FILE_CACHE if key not in FILE_IDS]
+    errors = await asyncio.gather(*(upload(key) for key in keys))
+    return dict(zip(keys, errors))
+
+async def warm_up_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /warmup (admins only): upload all media once"""
+    if not is_admin(update):
+        return
+    chat_id = CACHE_CHAT_ID or update.effective_chat.id
+    await update.message.reply_text(f"Uploading {sum(key not in FILE_IDS for key in FILE_CACHE)} file(s)...")
+    results = await warm_up_media(context.bot, chat_id)
+    failed = [key for key, error in results.items() if error]
+    text = f"✅ Warm-up done: {len(results) - len(failed)} uploaded, {len(FILE_IDS)} file_ids cached."
+    if failed:
+        text += "\n❌ Failed: " + ", ".join(failed)
+    await update.message.reply_text(text)
+
+async def warm_up_cli():
+    """--warm-up: upload all media to CACHE_CHAT_ID and exit"""
+    if not CACHE_CHAT_ID:
+        print("Set CACHE_CHAT_ID to the chat that should receive the uploads")
+        return
+    async with Bot(BOT_TOKEN, base_url=BOT_API_BASE_URL, base_file_url=BOT_API_BASE_FILE_URL) as bot:
+        results = await warm_up_media(bot, CACHE_CHAT_ID)
+    print(f"Warm-up done: {sum(error is None for error in results.values())}/{len(results)} uploaded")
 
 # ===== SETUP LOGGING =====
 logging.basicConfig(
@@ -270,6 +1320,7 @@ def get_reported_and_fixed_issues_menu():
         ["Fixed Phone Number Already Exists Issues"],
         ["Fixed Blocked User/Account Issues"],
         ['"Fixed Automatically Returning to Login Screen Issues"'],
+        ["Fixed Issues in All Categories"],
         ["🏠 Main Menu"]
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
@@ -283,6 +1334,45 @@ def get_issue_report_menu():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+# Built once and shared by every reply; telegram objects are frozen after creation
+MAIN_KEYBOARD = get_main_keyboard()
+APP_DOWNLOAD_MENU = get_app_download_menu()
+REPORTED_AND_FIXED_ISSUES_MENU = get_reported_and_fixed_issues_menu()
+ISSUE_REPORT_MENU = get_issue_report_menu()
+
+def get_search_again_markup(category):
+    return InlineKeyboardMarkup([[InlineKeyboardButton("🔍 Search Another", callback_data=f"search_{category}")]])
+
+# Holds search category -> "Search Another" button shown under a search result
+SEARCH_AGAIN_MARKUPS = {
+    category: get_search_again_markup(category) for category in SOLVED_CATEGORIES + [ALL_CATEGORIES]
+}
+
+# Buttons sent in groups to move the user to the bot's private chat, by /start argument
+DEEP_LINK_LABELS = {
+    "report": "➡️ Start Reporting",
+    "search": "🔍 Open Search Menu",
+}
+# Filled in by post_init from the identity fetched once at startup
+BOT_USERNAME = None
+DEEP_LINK_MARKUPS = {}
+
+def render_deep_links(bot_username):
+    """Pre-render the deep-link buttons for bot_username"""
+    global BOT_USERNAME, DEEP_LINK_MARKUPS
+    DEEP_LINK_MARKUPS = {
+        start: InlineKeyboardMarkup([[InlineKeyboardButton(label, url=f"https://t.me/{bot_username}?start={start}")]])
+        for start, label in DEEP_LINK_LABELS.items()
+    }
+    BOT_USERNAME = bot_username
+
+def get_deep_link_markup(bot, start):
+    """Deep-link button for start, re-rendered only if the bot's username changed"""
+    if bot.username != BOT_USERNAME:
+        print(f"Bot username is now @{bot.username}, rebuilding deep links")
+        render_deep_links(bot.username)
+    return DEEP_LINK_MARKUPS[start]
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command with clean formatting and redirect support"""
     # 1. Capture the deep-link argument (if any)
@@ -302,7 +1392,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "If your issue is not on the list, Do not report here.\n\n"
             "ከተዘረዘሩት ችግሮች ውስጥ የእርሶ ችግር የሚዛመድ ከሆነ ብቻ ሪፖርት ያድርጉ።\n"
             "ጉዳይዎ በዝርዝሩ ውስጥ ከሌለ፣ እባክዎን እዚህ ሪፖርት አያድርጉ።",
-            reply_markup=get_issue_report_menu(),
+            reply_markup=ISSUE_REPORT_MENU,
             parse_mode="Markdown"
         )
         return
@@ -316,7 +1406,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "🔹 **How to search:**\n"
             "1️⃣ Choose a category from the buttons below.\n"
             "2️⃣ Enter the customer's phone number when prompted.\n",
-            reply_markup=get_reported_and_fixed_issues_menu(),
+            reply_markup=REPORTED_AND_FIXED_ISSUES_MENU,
             parse_mode="Markdown"
         )
         return
@@ -329,7 +1419,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     await update.message.reply_text(
         welcome_text,
-        reply_markup=get_main_keyboard(),
+        reply_markup=MAIN_KEYBOARD,
         parse_mode="Markdown"
     )
     logger.info(f"User {update.effective_user.id} started the bot")
@@ -343,712 +1433,667 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 Select an option from the keyboard below for specific help:"""
     await update.message.reply_text(
         help_text,
-        reply_markup=get_main_keyboard()
+        reply_markup=MAIN_KEYBOARD
     )
     return
 
-# ===== BUTTON HANDLERS =====
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle all text messages, button clicks, and reporting states"""
-    user_message = update.message.text
-    # Get the current state
-    state = context.user_data.get("state")
-
-    # ==========================================
-    #   PRIORITY COMMANDS & RESET BUTTONS
-    # ==========================================
-    # These always run first. If a user clicks a button, we stop any state.
-
-    # Back to main
-    if user_message == "🔙 Back" or user_message == "🏠 Main Menu":
-        context.user_data.clear() # Reset everything
-        await update.message.reply_text(
-            "Return to Main menu",
-            reply_markup=get_main_keyboard()
-    )
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /stats (admins only) with today's report counts"""
+    if not is_admin(update):
         return
-    
-    # Report Issue
-    elif user_message == "Report Issue":
-        context.user_data.clear() # Kill any previous state
-        # Check if the message is coming from a group
-        if update.effective_chat.type in ["group", "supergroup"]:
-            #  URL button to the bot's private chat The 'start=report' part acts as a deep link
-            bot_username = (await context.bot.get_me()).username
-            keyboard = [
-                [InlineKeyboardButton("➡️ Start Reporting", url=f"https://t.me/{bot_username}?start=report")],
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-    "🛡️ *Privacy & Security Notice*\n\n"
-    "To protect customer phone numbers and keep this group clean and organized, "
-    "all reporting must be done in a *private chat* through the bot.\n\n"
-    "የደንበኞችን መረጃ ለመጠበቅ እና ይህን Group ንፁህ እና የተደራጀ ለማድረግ ሁሉም ሪፖርት ከቦት ጋር በሚደረግ private chat መደረግ አለበት።\n\n"
-    "Click the button below to start reporting.\n"
-    "ሪፖርት ለማድረግ ከታች ያለውን Button ይጫኑ።",
-    
-    reply_markup=reply_markup,
-    parse_mode="Markdown"
-)
-            return
-        else:
-            # If they are already in private chat, show the reporting menu
-            context.user_data.clear()
-            await update.message.reply_text("*Select Issue Type:\n\n*" 
-             "⚠️ *IMPORTANT WARNING* ⚠️\n\n"
-            "Please check the menus below carefully. You must *only* report your issue "
-            "if it matches one of the specific issues listed."
-            "If your issue is not on the list, Do not report here.\n\n"
-            "ከተዘረዘሩት ችግሮች ውስጥ የእርሶ ችግር የሚዛመድ ከሆነ ብቻ ሪፖርት ያድርጉ።\n"
-            "ጉዳይዎ በዝርዝሩ ውስጥ ከሌለ፣ እባክዎን እዚህ ሪፖርት አያድርጉ።",
-            reply_markup=get_issue_report_menu(),
-            parse_mode="Markdown")
-            return
-    
-    # Reported And Fixed Issues Menu
-    elif user_message == "Reported And Fixed Issues":
-        # Check if the message is coming from a group
-        if update.effective_chat.type in ["group", "supergroup"]:
-            bot_username = (await context.bot.get_me()).username
-            # We use 'start=search' as a deep link to tell the bot to open the search menu
-            keyboard = [
-                [InlineKeyboardButton("🔍 Open Search Menu", url=f"https://t.me/{bot_username}?start=search")],
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                "🛡️ *Privacy & Security Notice*\n\n"
-                "To protect customer privacy, searching for fixed issues must be done in a *private chat*.\n\n"
-                "የደንበኞችን ደህንነት ለመጠበቅ፣ የተቀረፉ ችግሮችን ማረጋገጥ የሚቻለው በቦት በኩል በሚደረግ *private chat* ብቻ መሆን አለበት።\n\n"
-                "Click the button below to start checking.\n"
-                "ለማረጋገጥ ከታች ያለውን Button ይጫኑ።",
-                reply_markup=reply_markup,
-                parse_mode="Markdown"
-            )
-            return
-        
-        # If already in private chat, show the menu normally
-        await update.message.reply_text(
-            "📋 *Reported And Fixed Issues Searching Menu*\n\n"
-            "⚠️ *Warning:* To check if your a report is resolved, you *MUST*:\n"
-            "1. Ensure you selected the *Correct Issue Type*.\n"
-            "2. Search using the *Phone Number* you have previously reported.\n\n"
-            "⚠️ *ማስጠንቀቂያ:* ሪፖርትዎ መፍትሄ ማግኘቱን ለማረጋገጥ:\n"
-            "1. ሪፖርት ያደረጉትን ትክክለኛ የችግር አይነት መምረጥዎን ያረጋግጡ።\n"
-            "2. ከዚህ ቀደም ሪፖርት ያደረጉትን *ስልክ ቁጥር* በመጠቀም ይፈልጉ።\n",
-            reply_markup=get_reported_and_fixed_issues_menu(),
-            parse_mode="Markdown"
-        )
-        return
-
-    # ==========================================
-    #   Fixed Reported Issues Menus
-    # ==========================================
-    # Fixed Phone Number Already Exists Issues
-    elif user_message == "Fixed Phone Number Already Exists Issues":
-        context.user_data.clear() # Kill any previous state
-        context.user_data["search_category"] = "Phone Number Already Exists"
-        context.user_data["state"] = "WAITING_FOR_SEARCH"
-    
-        await update.message.reply_text(
-        "🔍 **Search Customers phone number from *Resolved Phone Number Already Exists Issues* **\n\n"
-       "Please enter only the customers phone number.\n"
-       "እባክዎ የደንበኛውን ስልክ ቁጥር ያስገቡ።",
-        parse_mode="Markdown"
+    today = datetime.date.today().isoformat()
+    # The CSV backend reads every daily file, so not on the event loop
+    counts = await asyncio.to_thread(
+        lambda: [(report_type, STORAGE.count_reports(report_type, today)) for report_type in REPORT_TYPES]
     )
+    lines = [f"📊 Issues reported today ({today}):", ""]
+    for report_type, count in counts:
+        lines.append(f"{report_type.replace('_', ' ')}: {count}")
+    await update.message.reply_text("\n".join(lines))
+
+async def pending_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /pending (admins only): reported numbers not fixed yet, oldest first"""
+    if not is_admin(update):
         return
-
-    # Fixed Blocked User/Account Issues
-    elif user_message == "Fixed Blocked User/Account Issues":
-        context.user_data.clear() # Kill any previous state
-        context.user_data["search_category"] = "Blocked_Users"
-        context.user_data["state"] = "WAITING_FOR_SEARCH"
-    
-        await update.message.reply_text(
-        "🔍 **Search Customers phone number from *Resolved Blocked User/Account Issues* **\n\n"
-      "Please enter only the customers phone number.\n"
-       "እባክዎ የደንበኛውን ስልክ ቁጥር ያስገቡ።",
-            parse_mode="Markdown"
+    today = datetime.date.today()
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["Category", "Phone Number", "Pending Since", "Days"])
+    lines = ["⏳ Reports not fixed yet:", ""]
+    for category in SOLVED_CATEGORIES:
+        pending = sorted(PENDING.pending(category).items(), key=lambda item: item[1])
+        oldest = f", oldest since {format_pending_since(pending[0][1])}" if pending else ""
+        lines.append(f"{category.replace('_', ' ')}: {len(pending)}{oldest}")
+        writer.writerows(
+            [category.replace("_", " "), f"0{key}", format_fix_date(since), today.toordinal() - since]
+            for key, since in pending
+        )
+    await update.message.reply_document(
+        document=out.getvalue().encode("utf-8-sig"),
+        filename=f"pending_{today.isoformat()}.csv",
+        caption="\n".join(lines)
     )
-        return
 
-    # Fixed Automatically Returning to Login Screen Issues
-    elif user_message == '"Fixed Automatically Returning to Login Screen Issues"':
-        context.user_data.clear() # Kill any previous state
-        context.user_data["search_category"] = "Automatic Return"
-        context.user_data["state"] = "WAITING_FOR_SEARCH"
-    
-        await update.message.reply_text(
-        "🔍 **Search Customers phone number from *Resolved Automatically Returning to Login Screen Issues* **\n\n"
-        "Please enter only the customers phone number.\n"
-        "እባክዎ የደንበኛውን ስልክ ቁጥር ያስገቡ።",
-            parse_mode="Markdown"
-        )
-        return
+# ===== PROFILING =====
+# Longest /profile run allowed, and the stack sampling period of "sample" mode
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+# Set while a /profile run is going on, only one at a time
+PROFILE_RUNNING = False
+
+def deep_size(obj, seen=None):
+    """Approximate bytes held by obj and the containers/strings inside it"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in list(obj.items()))
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in list(obj))
+    return size
+
+def measure_state(application):
+    """(entries, approximate bytes) of the caches that grow while the bot runs"""
+    return {
+        "FILE_CACHE": (len(FILE_CACHE), deep_size(FILE_CACHE)),
+        "FILE_IDS": (len(FILE_IDS), deep_size(FILE_IDS)),
+        "user_data": (len(application.user_data), deep_size(dict(application.user_data))),
+    }
 
-    # ==========================================
-    #   Report Issue Menus
-    # ==========================================
-    # Phone Number Already Exists issue reporting
-    elif user_message == "Phone Number Already Exists":
-        context.user_data["report_issue_type"] = "Phone Already Exists"
-        context.user_data["state"] = "WAITING_FOR_NAME"
-        await update.message.reply_text("*Existing Phone No Reporting...*", parse_mode="Markdown")
-        await update.message.reply_text("Please enter the customer's **Full Name**:", parse_mode="Markdown")
-        return
-    # Phone Number Already Exists issue reporting
-    elif user_message == "Blocked User/Account":
-        context.user_data["report_issue_type"] = "User Blocked"
-        context.user_data["state"] = "WAITING_FOR_NAME"
-        await update.message.reply_text("*Account Blocked Reporting...*", parse_mode="Markdown")
-        await update.message.reply_text("Please enter the customer's **Full Name**:", parse_mode="Markdown")
+def sample_stacks(thread_id, stop, interval):
+    """Counts the stacks of thread_id every interval seconds until stop is set"""
+    stacks = collections.Counter()
+    while not stop.wait(interval):
+        frame = sys._current_frames().get(thread_id)
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        stacks[";".join(reversed(names))] += 1
+    return stacks
+
+async def profile_event_loop(application, seconds, mode):
+    """
+    Profiles everything the event loop runs for `seconds`, deterministically
+    with cProfile ("cpu") or by sampling its stack ("sample"), and records
+    tracemalloc and cache growth. Returns the zip file as bytes.
+    """
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    state_before = measure_state(application)
+    memory_before = tracemalloc.take_snapshot()
+
+    files = {}
+    if mode == "cpu":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        stats_text = io.StringIO()
+        pstats.Stats(profiler, stream=stats_text).sort_stats("cumulative").print_stats(60)
+        files["profile.txt"] = stats_text.getvalue()
+        # Same bytes as profiler.dump_stats(), loadable by pstats and snakeviz
+        profiler.create_stats()
+        files["profile.prof"] = marshal.dumps(profiler.stats)
+    else:
+        stop = threading.Event()
+        sampler = asyncio.create_task(asyncio.to_thread(
+            sample_stacks, threading.get_ident(), stop, PROFILE_SAMPLE_INTERVAL
+        ))
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+        stacks = await sampler
+        # Collapsed stacks, readable by flamegraph.pl and speedscope
+        files["stacks.txt"] = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    memory_after = tracemalloc.take_snapshot()
+    state_after = measure_state(application)
+    if started_tracing:
+        tracemalloc.stop()
+
+    summary = [f"mode: {mode}, {seconds} s", "", "cache            entries before -> after    bytes before -> after"]
+    for name, (entries, size) in state_before.items():
+        entries_after, size_after = state_after[name]
+        summary.append(f"{name:<16} {entries:>7} -> {entries_after:<7}    {size:>12} -> {size_after}")
+    summary += ["", "tracemalloc, top allocation growth:"]
+    summary += [str(stat) for stat in memory_after.compare_to(memory_before, "lineno")[:30]]
+    files["summary.txt"] = "\n".join(summary) + "\n"
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return out.getvalue()
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /profile [seconds] [cpu|sample] (admins only); the result goes to the admin's private chat"""
+    global PROFILE_RUNNING
+    if not is_admin(update):
         return
-    # Automatically Returning to Login Screen
-    elif user_message == '"Automatically Returning to Login Screen"':
-        context.user_data["report_issue_type"] = "Automatically Returning to Login Screen"
-        context.user_data["state"] = "WAITING_FOR_NAME"
-        await update.message.reply_text("*Automatically Returning to Login Screen Reporting...*", parse_mode="Markdown")
-        await update.message.reply_text("Please enter the customer's **Full Name**:", parse_mode="Markdown")
+    args = context.args or []
+    seconds = int(args[0]) if args and args[0].isdigit() else 30
+    seconds = max(1, min(seconds, PROFILE_MAX_SECONDS))
+    mode = args[1] if len(args) > 1 and args[1] in ("cpu", "sample") else "cpu"
+    if PROFILE_RUNNING:
+        await update.message.reply_text("⚠️ A profile is already running.")
         return
 
-    # ==========================================
-    # ACTIVE STATE MACHINE
-    # ==========================================
-    # This only runs if the user is in the middle of a report.
-    if state == "WAITING_FOR_SEARCH":
-        # This is the search logic you wanted to add here
-        category = context.user_data.get("search_category", "General")
-        
-        # Normalize the search input (last 7 digits)
-        target = normalize_ethiopian_phone(user_message)
-        
-        if len(target) < 7:
-            await update.message.reply_text("⚠️ Please enter a valid number (at least 7-9 digits).")
-            return
+    PROFILE_RUNNING = True
+    # In its own task: the handler returns at once and does not hold the
+    # admin's update lock (or a running slot) for the whole profile
+    context.application.create_task(send_profile(update, context, seconds, mode), update=update)
 
-        found_data = search_phone_in_reports(user_message, category)
-        
-        if found_data:
-        # We only take the first record [0] to avoid duplicates
-            item = found_data[0] 
-            text = (
-                f"✅ **Record Found:**\n\n"
-                f"📱 **Phone:** 0{target}\n"
-                f"🚩 **Status:** {item['status']}\n\n"
-            )
+async def send_profile(update: Update, context: ContextTypes.DEFAULT_TYPE, seconds, mode):
+    global PROFILE_RUNNING
+    try:
+        await update.message.reply_text(f"⏱️ Profiling the bot for {seconds} s ({mode})...")
+        data = await profile_event_loop(context.application, seconds, mode)
+    finally:
+        PROFILE_RUNNING = False
+    await context.bot.send_document(
+        chat_id=update.effective_user.id,
+        document=data,
+        filename=f"profile_{mode}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+        caption=f"Profile of {seconds} s ({mode})"
+    )
 
-        else:
-            text = f"❌ No record found for `{user_message}`."
+# ===== BUTTON HANDLERS =====
+# ==========================================
+#   PRIORITY COMMANDS & RESET BUTTONS
+# ==========================================
+# These always run first. If a user clicks a button, we stop any state.
+# Back to main
+async def back_to_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.clear() # Reset everything
+    await update.message.reply_text(
+        "Return to Main menu",
+        reply_markup=MAIN_KEYBOARD
+    )
 
-        # Inline button to search again
-        keyboard = [[InlineKeyboardButton("🔍 Search Another", callback_data=f"search_{category}")]]
+# Report Issue
+async def report_issue_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.clear() # Kill any previous state
+    # Check if the message is coming from a group
+    if update.effective_chat.type in ["group", "supergroup"]:
+        #  URL button to the bot's private chat The 'start=report' part acts as a deep link
+        reply_markup = get_deep_link_markup(context.bot, "report")
         
-        # only clear the state so they can stay in this category if they want
-        context.user_data["state"] = None
-        
-        await update.message.reply_text(text, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(keyboard))
-        return
-
-    elif state == "WAITING_FOR_NAME":
-        context.user_data["temp_name"] = user_message
-        context.user_data["state"] = "WAITING_FOR_PHONE"
         await update.message.reply_text(
-            f"Full Name recorded:    {user_message}\n\nNow, please enter the **Phone Number**:", 
+            "🛡️ *Privacy & Security Notice*\n\n"
+            "To protect customer phone numbers and keep this group clean and organized, "
+            "all reporting must be done in a *private chat* through the bot.\n\n"
+            "የደንበኞችን መረጃ ለመጠበቅ እና ይህን Group ንፁህ እና የተደራጀ ለማድረግ ሁሉም ሪፖርት ከቦት ጋር በሚደረግ private chat መደረግ አለበት።\n\n"
+            "Click the button below to start reporting.\n"
+            "ሪፖርት ለማድረግ ከታች ያለውን Button ይጫኑ።",
+            reply_markup=reply_markup,
             parse_mode="Markdown"
         )
         return
-
-    elif state == "WAITING_FOR_PHONE":
-        # 1. Get the data from context BEFORE clearing
-        name = context.user_data.get("temp_name")
-        issue = context.user_data.get("report_issue_type")
-        
-        # 2. Format the phone number to (+251)
-        formatted_phone = format_for_storage(user_message)
-        
-        if not formatted_phone:
-            await update.message.reply_text("❌ **Invalid Format.** Please use `09...`, `07...` or `+251...`")
-            return
-        
-        # 3. Save to CSV and Clear state and temp data AFTER
-        save_report_to_file(name, formatted_phone, issue)
+    else:
+        # If they are already in private chat, show the reporting menu
         context.user_data.clear()
+        await update.message.reply_text("*Select Issue Type:\n\n*" 
+         "⚠️ *IMPORTANT WARNING* ⚠️\n\n"
+        "Please check the menus below carefully. You must *only* report your issue "
+        "if it matches one of the specific issues listed."
+        "If your issue is not on the list, Do not report here.\n\n"
+        "ከተዘረዘሩት ችግሮች ውስጥ የእርሶ ችግር የሚዛመድ ከሆነ ብቻ ሪፖርት ያድርጉ።\n"
+        "ጉዳይዎ በዝርዝሩ ውስጥ ከሌለ፣ እባክዎን እዚህ ሪፖርት አያድርጉ።",
+        reply_markup=ISSUE_REPORT_MENU,
+        parse_mode="Markdown")
+
+# Reported And Fixed Issues Menu
+async def reported_and_fixed_issues_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Check if the message is coming from a group
+    if update.effective_chat.type in ["group", "supergroup"]:
+        # We use 'start=search' as a deep link to tell the bot to open the search menu
+        reply_markup = get_deep_link_markup(context.bot, "search")
         
         await update.message.reply_text(
-            f"🚀 **Issue Reported Successfully**\n\n"
-            f"👤 **Full Name:** {name}\n"
-            f"📱 **Phone:** `{formatted_phone}`\n"
-            f"📝 **Type:** {issue}",
-            parse_mode="Markdown",
-            reply_markup=get_main_keyboard()
-        )
-        return
-
-    # ==========================================
-    #  Main Keybaord Menus
-    # ==========================================
-    # Digital Access Process
-    if user_message == "Digital Access Process":
-        response = """Digital Access Process
-Video Tutorial: https://t.me/anbesaplus/2506
-"""
-        await update.message.reply_text(
-            response,
-            reply_markup=get_main_keyboard()
+            "🛡️ *Privacy & Security Notice*\n\n"
+            "To protect customer privacy, searching for fixed issues must be done in a *private chat*.\n\n"
+            "የደንበኞችን ደህንነት ለመጠበቅ፣ የተቀረፉ ችግሮችን ማረጋገጥ የሚቻለው በቦት በኩል በሚደረግ *private chat* ብቻ መሆን አለበት።\n\n"
+            "Click the button below to start checking.\n"
+            "ለማረጋገጥ ከታች ያለውን Button ይጫኑ።",
+            reply_markup=reply_markup,
+            parse_mode="Markdown"
         )
         return
     
-    # How to unlock customer in the backoffice
-    elif user_message == "How to unlock customer in the backoffice":
-        response = """Steps to unlock customer in the DBS Backoffice 
-Video Tutorial: https://t.me/anbesaplus/2132
-"""
-        await update.message.reply_text(
-            response,
-            reply_markup=get_main_keyboard()
-        )
-        return
+    # If already in private chat, show the menu normally
+    await update.message.reply_text(
+        "📋 *Reported And Fixed Issues Searching Menu*\n\n"
+        "⚠️ *Warning:* To check if your a report is resolved, you *MUST*:\n"
+        "1. Ensure you selected the *Correct Issue Type*.\n"
+        "2. Search using the *Phone Number* you have previously reported.\n\n"
+        "⚠️ *ማስጠንቀቂያ:* ሪፖርትዎ መፍትሄ ማግኘቱን ለማረጋገጥ:\n"
+        "1. ሪፖርት ያደረጉትን ትክክለኛ የችግር አይነት መምረጥዎን ያረጋግጡ።\n"
+        "2. ከዚህ ቀደም ሪፖርት ያደረጉትን *ስልክ ቁጥር* በመጠቀም ይፈልጉ።\n",
+        reply_markup=REPORTED_AND_FIXED_ISSUES_MENU,
+        parse_mode="Markdown"
+    )
 
-        # How to unlock customer in the backoffice
-    elif user_message == "🔥🔥 IMMEDIATE ALERT (አስቸኳይ መረጃ) 🔥🔥":
-        response = """
-🔥* To make the rollout process of Anbesa Plus Smooth and Successful, we have arranged Second Round online session for all branches. Branches are expected to dedicate atleast one person for this session.*
+# ==========================================
+#   Fixed Reported Issues Menus
+# ==========================================
+# Fixed Phone Number Already Exists Issues
+async def search_fixed_phone_exists(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.clear() # Kill any previous state
+    context.user_data["search_category"] = "Phone Number Already Exists"
+    context.user_data["state"] = "WAITING_FOR_SEARCH"
 
-*Digital Ambassadors of each branch must attend the session.*
+    await update.message.reply_text(
+        "🔍 **Search Customers phone number from *Resolved Phone Number Already Exists Issues* **\n\n"
+        "Please enter only the customers phone number.\n"
+        "እባክዎ የደንበኛውን ስልክ ቁጥር ያስገቡ።\n\n"
+        "📄 To check many customers at once, paste the numbers one per line or send a CSV file.",
+        parse_mode="Markdown"
+    )
 
-*የአንበሳ ፕላስ መተግብሪያን እና የአንበሳ ባንክን የዲጅታል የለወጥ ሂደት የተሳካ እንዲሆን ለማድረግ ለሁሉም ቅርንጫፎች ሁለተኛ ዙር የኦላይን የጥያቄ እና መልስ ክፍለ ጊዜ አዘጋጅተናል። ከቅርንጫፍ ቢያንስ አንድ ሰው እንዲሳተፍ ግዴታ ነው።*
+# Fixed Blocked User/Account Issues
+async def search_fixed_blocked_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.clear() # Kill any previous state
+    context.user_data["search_category"] = "Blocked_Users"
+    context.user_data["state"] = "WAITING_FOR_SEARCH"
 
-*የእያንዳንዱ ቅርንጫፍ ዲጂታል አምባሳደሮች መሳተፍ አለባቸው።*
+    await update.message.reply_text(
+        "🔍 **Search Customers phone number from *Resolved Blocked User/Account Issues* **\n\n"
+        "Please enter only the customers phone number.\n"
+        "እባክዎ የደንበኛውን ስልክ ቁጥር ያስገቡ።\n\n"
+        "📄 To check many customers at once, paste the numbers one per line or send a CSV file.",
+        parse_mode="Markdown"
+    )
 
-*🕧 ሰአት: ቅዳሜ ጠዋት 3:00*
+# Fixed Automatically Returning to Login Screen Issues
+async def search_fixed_automatic_return(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.clear() # Kill any previous state
+    context.user_data["search_category"] = "Automatic Return"
+    context.user_data["state"] = "WAITING_FOR_SEARCH"
 
-🔥 Title:  A Request for Second Round Online Session
+    await update.message.reply_text(
+        "🔍 **Search Customers phone number from *Resolved Automatically Returning to Login Screen Issues* **\n\n"
+        "Please enter only the customers phone number.\n"
+        "እባክዎ የደንበኛውን ስልክ ቁጥር ያስገቡ።\n\n"
+        "📄 To check many customers at once, paste the numbers one per line or send a CSV file.",
+        parse_mode="Markdown"
+    )
 
-Anbesa Plus Rollout Second Round Online Session
-Saturday, February 14, 2026
-9:00 AM  |  (UTC+03:00) Nairobi  |  2 hrs 30 mins
+# Fixed issues in all categories at once
+async def search_fixed_all_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.clear() # Kill any previous state
+    context.user_data["search_category"] = ALL_CATEGORIES
+    context.user_data["state"] = "WAITING_FOR_SEARCH"
 
-Meeting number (access code):  * 2554 485 2539*
-Meeting password:   *MB@ab1*
-*
-When it's time, click the link below.
-https://anbesabank.webex.com/anbesabank/j.php?MTID=mb87517a0b86da76cd320a073a946fce9  *
-"""
-        await update.message.reply_text(
-            response,   
-            parse_mode="Markdown",
-            reply_markup=get_main_keyboard()
-        )
+    await update.message.reply_text(
+        "🔍 **Search Customers phone number in *all Resolved Issues* **\n\n"
+        "Please enter only the customers phone number.\n"
+        "እባክዎ የደንበኛውን ስልክ ቁጥር ያስገቡ።\n\n"
+        "📄 To check many customers at once, paste the numbers one per line or send a CSV file.",
+        parse_mode="Markdown"
+    )
+
+# ==========================================
+#   Report Issue Menus
+# ==========================================
+# Phone Number Already Exists issue reporting
+async def report_phone_exists(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data["report_issue_type"] = "Phone Already Exists"
+    context.user_data["state"] = "WAITING_FOR_NAME"
+    await update.message.reply_text("*Existing Phone No Reporting...*", parse_mode="Markdown")
+    await update.message.reply_text("Please enter the customer's **Full Name**:", parse_mode="Markdown")
+
+# Blocked User/Account issue reporting
+async def report_blocked_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data["report_issue_type"] = "User Blocked"
+    context.user_data["state"] = "WAITING_FOR_NAME"
+    await update.message.reply_text("*Account Blocked Reporting...*", parse_mode="Markdown")
+    await update.message.reply_text("Please enter the customer's **Full Name**:", parse_mode="Markdown")
+
+# Automatically Returning to Login Screen
+async def report_automatic_return(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data["report_issue_type"] = "Automatically Returning to Login Screen"
+    context.user_data["state"] = "WAITING_FOR_NAME"
+    await update.message.reply_text("*Automatically Returning to Login Screen Reporting...*", parse_mode="Markdown")
+    await update.message.reply_text("Please enter the customer's **Full Name**:", parse_mode="Markdown")
+
+# ==========================================
+# ACTIVE STATE MACHINE
+# ==========================================
+# This only runs if the user is in the middle of a report.
+# Several numbers pasted or sent as a file after choosing a search category
+async def send_bulk_results(update: Update, context: ContextTypes.DEFAULT_TYPE, phone_numbers):
+    category = context.user_data.get("search_category", "General")
+    if not phone_numbers:
+        await update.message.reply_text("⚠️ No phone numbers found. Send one number per line.")
         return
-    
-    # How to login to DBS backoffice
-    elif user_message == "How to login to DBS backoffice":
-        response = """Steps to Log in to DBS Backoffice
-Video Tutorial: https://t.me/anbesaplus/2252
-"""
-        
-        await update.message.reply_text(
-            response,
-            reply_markup=get_main_keyboard()
-        )
+    if len(phone_numbers) > BULK_SEARCH_LIMIT:
+        await update.message.reply_text(f"⚠️ Please send at most {BULK_SEARCH_LIMIT} numbers at once.")
         return
 
-    # Digital Access Approval on CBS (Manual Review)
-    elif user_message == "Digital Access Approval on CBS (Manual Review)":
-        caption = """Check the Video for Steps of Digital Access Approval on CBS (Manual Review)
-"""
-        await send_cached_file(update, "Approve_of_Digital_Access_on_CBS_video", caption=caption,parse_mode="Markdown")
+    results = search_phones_bulk(phone_numbers, category)
+    invalid = sum(1 for _, key, _, _ in results if len(key) < 7)
+    fixed = sum(1 for _, _, found, _ in results if found)
+    pending = sum(1 for _, _, found, open_reports in results if open_reports and not found)
+    context.user_data["state"] = None
+    await update.message.reply_document(
+        document=render_bulk_results(results),
+        filename=f"search_{category.replace(' ', '_')}_{datetime.date.today().isoformat()}.csv",
+        caption=(
+            f"🔍 {len(results)} numbers checked in {category.replace('_', ' ')}\n"
+            f"✅ Fixed: {fixed}\n⏳ Pending: {pending}\n"
+            f"❌ Not found: {len(results) - fixed - pending - invalid}\n⚠️ Invalid: {invalid}"
+        ),
+        reply_markup=SEARCH_AGAIN_MARKUPS.get(category) or get_search_again_markup(category)
+    )
 
+# CSV or text file sent after choosing a search category
+async def handle_search_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    document = update.message.document
+    if not (document.file_name or "").lower().endswith((".csv", ".txt")):
+        await update.message.reply_text("⚠️ Please send the numbers as a .csv or .txt file.")
         return
-
-    # Overlay Detected Avoid Entering Sensetive Information Error
-    elif user_message == "Overlay Detected Avoid Entering Sensetive Information Error":
-        response = """This error occurs when your device detected an app on top of Anbesa Plus—for example, a screen recorder or any app that can display over other apps. This is a security measure to protect sensitive information like passwords, PINs, or payment details.
-
-*ይህ የሚያጋጥመው ስልክዎ በአንበሳ ፕላስ መተግበሪያ ላይ ተጨማሪ ሌላ መተግበሪያ ሲያገኝ ሲሆን ለምሳሌ Screen Recorder ወይም ሌሎች መተግበሪያዎች ሊሆኑ ይችላሉ።ይህም የይለፍ ቃላት(Password)፣ ፒን(Pin) ወይም ሌሎች የክፍያ ዝርዝሮች እና ሚስጥራዊነት ያላቸውን መረጃዎች ለመጠበቅ የተደረገ የደህንነት እርምጃ ነው።*
-
-    Steps to Fix This Overlay Warning
-
-1️⃣ ⚙️ Open Settings on your phone.
-
-2️⃣ 📱 Go to Apps.
-
-3️⃣  ⋮  Tap the three dots at the top-right → select Special app access.
-
-4️⃣  Choose Display over other apps (sometimes called Draw over other apps or Appear on top).
-
-Look for apps that may create overlays:
-Example: Screen recorders, Floating widgets or notepads, Screen dimming apps
-
-5️⃣ Temporarily disable these apps.
-
-🔙 Go back to Anbesa Plus and try again
-
-💡 Tip: After finishing your sensitive actions, you can re-enable any apps you need.
-"""
-        
-        await update.message.reply_text(
-            response,
-            parse_mode="Markdown",
-            reply_markup=get_main_keyboard()
-        )
+    if document.file_size and document.file_size > BULK_SEARCH_MAX_BYTES:
+        await update.message.reply_text(f"⚠️ The file is too large, the limit is {BULK_SEARCH_MAX_BYTES // 1024} KB.")
         return
-    
-    # What branches do when the customer is blocked
-    elif user_message == "What branches do when the customer is blocked":
-        caption = """
-https://t.me/anbesaplus/12418
-
-Branches need to know the difference between Blocked and Locked:
-ቅርንጫፎች *በታገዷል* እና *በተቆልፏል* መካከል ያለውን ልዩነት ማወቅ አለባቸው።
-
-- *⛔ Blocked*: Only Head Office (Third-Level Support) can fix this. When they unblock it, it applies to everyone at once—not just one customer.
-*Blocked ማለት ታግዷል ሲሆን በዋናው መ/ቤት የሶስተኛ ደረጃ ድጋፍ ብቻ ነው መስተካከል የሚችለው። እገዳውን ሲያነሱት ለሁሉም በአንድ ጊዜ እንጂ ደንበኛ በደንበኛ አይደለም ስለዚህ ጥያቄያችሁን ልካችሁ እስኪስተካከል በትዕግስት ጠብቁ።*
-
-- *🔓 Locked*: The branch can fix this themselves by unlocking it directly in the DBS back office system.
-*Locked ​ማለት ተቆልፏል ሲሆን ቅርንጫፍ ላይ በቀጥታ DBS back office system በመጠቀም ማስተካከል ይቻላል።*
+    data = await (await document.get_file()).download_as_bytearray()
+    await send_bulk_results(update, context, read_bulk_phones(data.decode("utf-8-sig", errors="replace")))
 
-⚠️ Before sclaating the problem to the Head Office, branches should check if the customer is Blocked or Locked. If it's Blocked also make sure the status in the BackOffice system is also Blocked then try to reset it.
-
-ችግሩን ወደ ዋናው መሥሪያ ቤት ከመላኩ በፊት ቅርንጫፍ ላይ በደንበኛው ስልክ የታገደ መሆኑን ማረጋገጥ አለባቸው። ከታገደ በBackOffice ሁኔታ መታገዱን ያረጋግጡ ከዚያም እንደገና ለማስጀመር ይሞክሩ።
-"""
-        await send_cached_file(update, "blocked_customer_video", caption=caption,parse_mode="Markdown")
-
-    # How Anbesa Plus supports local language
-    elif user_message == "How Anbesa Plus supports local language":
-        response = """Anbesa Plus supports local language options in the app:
-Video Tutorial: https://t.me/anbesaplus/1676
-"""
-    
-        await update.message.reply_text(
-            response,  parse_mode="Markdown",
-            reply_markup=get_main_keyboard()
-        )
-        return
-    
-    # How to release trusted device
-    elif user_message == "How to release trusted device":
-        response = """How to release trusted device
-Video Tutorial: https://t.me/anbesaplus/2133
-                """
-        
-        await update.message.reply_text(
-            response,
-            reply_markup=get_main_keyboard()
-        )
+# Phone number typed after choosing a search category
+async def handle_search_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_message = update.message.text
+    if len(user_message.strip().splitlines()) > 1:
+        await send_bulk_results(update, context, read_bulk_phones(user_message))
         return
+    # This is the search logic you wanted to add here
+    category = context.user_data.get("search_category", "General")
     
-    # How to search customer in DBS backoffice
-    elif user_message == "How to search customer in DBS backoffice":
-        response = """How to search customer in DBS backoffice
-Video tutorial: https://t.me/anbesaplus/2131"""
-        
-        await update.message.reply_text(
-            response,
-            reply_markup=get_main_keyboard()
-        )
-        return
+    # Normalize the search input (last 7 digits)
+    target = normalize_ethiopian_phone(user_message)
     
-    # How Forgot password works
-    elif user_message == "How Forgot password works":
-        response = """How Forgot password works
-Video Tutorial: https://t.me/anbesaplus/1611."""
-        
-        await update.message.reply_text(
-            response,
-            reply_markup=get_main_keyboard()
-        )
+    if len(target) < 7:
+        await update.message.reply_text("⚠️ Please enter a valid number (at least 7-9 digits).")
         return
 
-    # Download Anbesa Plus Application
-    elif user_message == "⬇️ Download Anbesa Plus Application":
-        await update.message.reply_text(
-            "Select your device type:",
-        reply_markup=get_app_download_menu()
+    found_data = search_phone_in_reports(user_message, category)
+    # Reported after its last fix, or never fixed
+    pending = get_pending_categories(target, category)
+    pending_lines = "\n".join(
+        f"🔹 {c.replace('_', ' ')}: Pending since {format_pending_since(since)}"
+        for c, since in pending.items()
     )
-        return
-
-    # Android App Download link 
-    elif user_message == "Android App Download Link":
-        response = """🔗 Download the AnbesaPlus Android App from:
-        https://downloads.anbesabank.com/ """
-        
-        await update.message.reply_text(
-            response,
-            reply_markup=get_main_keyboard()
-            # reply_markup=get_app_download_menu()
-
+    
+    if found_data:
+        # The whole fix history, one line per category
+        found_in = {}
+        for item in found_data:
+            found_in.setdefault(item["category"], []).append(item["date"])
+        text = (
+            f"✅ **Record Found:**\n\n"
+            f"📱 **Phone:** 0{target}\n"
+            f"🚩 **Status:** {found_data[0]['status']}\n\n"
+            + "\n".join(
+                f"🔹 {c.replace('_', ' ')}: {', '.join(dates)}"
+                for c, dates in found_in.items()
+            )
         )
-        return
-    # Iphone App Download Link 
-    elif user_message == "Iphone App Download Link":
-        response = """
-❗️❗️ *These steps are temporary until the production app is officially released on the App Store.* ❗️❗️
-
-Steps to Download TestFlight and Install Anbesa Plus.
-
-1. Open the App Store on your Iphone.
-
-2. Search for *TestFlight* in the search bar.
-
-3. Download and install TestFlight.
-	Authenticate if needed (Face ID, Touch ID, or Apple ID password).
-
-4. Once TestFlight is installed.
-
-5. Open the link below to download Anbesa Plus.
-
-6. Tap *Install* in TestFlight to download Anbesa Plus.
-
-7. Open Anbesa Plus from TestFlight and start using it.
-
-🔗 Download the AnbesaPlus Iphone App from:
-        https://testflight.apple.com/join/Mz5erFuA """
-        
-        await update.message.reply_text(
-            response,   parse_mode="Markdown",
-            reply_markup=get_main_keyboard()
-            # reply_markup=get_app_download_menu()
-
+        # Counted per category: one fix in each of two categories is no repeat
+        repeats = [f"🔁 Fixed {len(dates)} times ({c.replace('_', ' ')})" for c, dates in found_in.items() if len(dates) > 1]
+        if repeats:
+            text += "\n\n" + "\n".join(repeats)
+        if pending:
+            # The issue came back after the fix
+            text += f"\n\n⏳ **Reported Again, Not Fixed Yet:**\n{pending_lines}"
+
+    elif pending:
+        # Reported but not in solved/ yet
+        text = (
+            f"⏳ **Not Fixed Yet:**\n\n"
+            f"📱 **Phone:** 0{target}\n\n"
+            + pending_lines
         )
-        return
+    else:
+        text = f"❌ No record found for `{user_message}`."
 
-        # DBS End User Manual for Branches
-    elif user_message == "DBS End User Manual for Branches":
-        response = """Get the DBS End User Manual for Branches:
-    https://t.me/anbesaplus/1199 """
-        
-        await update.message.reply_text(
-            response,
-            reply_markup=get_main_keyboard()
-        )
-        return
+    # Inline button to search again
+    reply_markup = SEARCH_AGAIN_MARKUPS.get(category) or get_search_again_markup(category)
     
-        # DBS Back Office / Portal User Access Request Form
-    elif user_message == "DBS Back Office / Portal User Access Request Form":
-        caption = """Get DBS Back Office / Portal User Access Request Form:
-
-When submitting a ticket in Help Desk, please select the help topic as ✅*Technical Support (…)*.✅
-
-Do not choose ❌*Others*❌, as such tickets are not forwarded to the appropriate place.
-
-If you are unable to submit through the Help Desk, you may send your request via Outlook to:
-
-በHelp Desk ውስጥ ትኬትዎን በሚልኩበት ጊዜ፣ እባክዎን ✅*Technical Support (…)*✅ የሚለውን ብቻ ይምረጡ።
-
-❌ሌላ አትምረጡ፣ቲኬቶች ወደ ተገቢው ቦታ እየደረሱ አይደለም።
-
-በHelp Desk በኩል መላክ ካልቻሉ ጥያቄዎን በOutlook በኩል ወደሚከተለው Email ይላኩ።
-
-- `tokumaj@anbesabank.com` and 
+    # only clear the state so they can stay in this category if they want
+    context.user_data["state"] = None
+    
+    await update.message.reply_text(text, parse_mode="Markdown", reply_markup=reply_markup)
 
-- `fisehad@anbesabank.com`"""
-        await send_cached_file(update, "DBS_backoffice_updated_form_pdf", caption=caption,parse_mode="Markdown")
+# Customer name typed while reporting
+async def handle_name_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_message = update.message.text
+    context.user_data["temp_name"] = user_message
+    context.user_data["state"] = "WAITING_FOR_PHONE"
+    await update.message.reply_text(
+        f"Full Name recorded:    {user_message}\n\nNow, please enter the **Phone Number**:", 
+        parse_mode="Markdown"
+    )
 
-        # await update.message.reply_text(
-        #     response,
-        #     parse_mode="Markdown",
-        #     reply_markup=get_main_keyboard()
-        # )
-        return
+# Customer phone typed while reporting
+async def handle_phone_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_message = update.message.text
+    # 1. Get the data from context BEFORE clearing
+    name = context.user_data.get("temp_name")
+    issue = context.user_data.get("report_issue_type")
     
-    # Backoffice User Access Updates
-    elif user_message == "Backoffice User Access Updates":
-        response = """📢 Backoffice User Access Updates
-Upto this week (20/February) the remaining branches who are not granted access DBS backoffice are the following:
-
-1. Adi Kelebes
-2. Adi_daero
-3. Adishihu
-4. Adwa
-5. Agazian
-6. Assosa
-7. Assayta
-8. Awlaelo
-9. AyatNoah
-10. Ayat_tafo
-11. Aynalem
-12. Berbere_tera
-13. Beshale
-14. Bethel
-15. Boditi
-16. Bolearabsa
-17. CMC
-18. Debre birhan
-19. Debre Tabor
-20. Dera
-21. Edagahamus
-22. Edagakedam
-23. EDAGABERHE
-24. Edagarebue
-25. Elala
-26. Furi
-27. Ginbgebeya
-28. Guroro
-29. Habte Giorgis
-30. Ifb Kukufto
-31. Kality
-32. Kality_gumuruk
-33. Kandearo
-34. Karakore
-35. Mariam Quiha
-36. Megenagn Athletderartu
-37. MekanisaAbo
-38. Parlama
-39. Seket
-40. Selekleka
-41. Semema
-42. Semera
-43. Shollagebeya
-44. Teklehaimanot
-45. Tuludimtu
-46. Weyni
-47. Wolkite
-48. Yechila
-49. Zelazle
-
-SMS has already been sent. Those who haven’t requested access yet must request it. If you requested this week, wait for notifications — we’ll send them soon. 
-You are adviced to follow instructions. Use the request form we have shared to you. You can find it in this group or in the bot menu.
-https://t.me/anbesaplus/3646
-"""
-        await update.message.reply_text(
-            response,
-            reply_markup=get_main_keyboard()
-        )
+    # 2. Format the phone number to (+251)
+    formatted_phone = format_for_storage(user_message)
+    
+    if not formatted_phone:
+        await update.message.reply_text("❌ **Invalid Format.** Please use `09...`, `07...` or `+251...`")
         return
     
-    # Announcements for Invalid Backoffice Requests
-    elif user_message == "❗️Announcements for Invalid Backoffice Requests":
-        response = """Upto this week (20/February)
-Branches who submitted requests earlier but did not receive access:
-ቀደም ሲል ጥያቄ አቅርባችሁ እስካሁን ፈቃድ (Access) ላልተሰጣችሁ ቅርንጫፎች፣ መዘግየቱ አብዛኛውን ጊዜ የሚፈጠረው ስህተት ከሆነ አሞላል የተያያዘ ነው። በመሆኑም በድጋሚ ጥያቄ ከማቅረባችሁ በፊት የሚከተሉትን ነጥቦች አረጋግጡ::
-
-```
-1. Adi Mehameday            21. Keta
-2. Adiabum                  22. Maymekden
-3. Adihaki Market           23. Meda agame
-4. Adisalem                 24. MEZBIR
-5. Adwa                     25. Moyale
-6. Agaro                    26. Sarbet
-7. Ahferom                  27. sebeya
-8. Aradagiorgis             28. Seket
-9. Ardijeganu               29. Semema
-10. Atote                   30. Shire Edaga
-11. Atsbi                   31. suhul shire
-12. Aweday                  32. Tana
-13. Berahle                 33. Warabe
-14. Boditi                  34. welwalo
-15. Endabaguna              35. Wollosefer
-16. Erdiseganu              36. Wuhalimat
-17. GojamBerenda            
-18. Injibara                
-19. kalamin                 
-20. Kality
-
-```
-Common reasons for delay or rejection:
-
- 1️⃣ Some requests may not be processed if not forwarded by IT Support to digital technology, If you believe your request is delayed and you have not received any response in Help Desk. 
-please send, Branch name and ticket number to the following users: @tokeyj or @Fish\_dt
- 
- 2️⃣ Requests submitted without full name or complete user information.
-
- 3️⃣ Submitting fewer than the required users or more than the allowed maximum
- 
- 4️⃣ Requests submitted without clear and readable round stamp
- 
- 5️⃣ Requests submitted for Branch Managers (these roles are not assigned Back Office access)
- 
- 6️⃣ Not using the official Anbesa Plus DBS Back Office Request Form
-
- 7️⃣ Missing Branch Manager approval where required
-
-*❗️ Reminder – Allowed Users per Branch:*
-
-- Each branch may submit **only 2 users**: 1 CSO and 1 Accountant/ CSM
-- Additionally, a branch may submit **1 Auditor**, only if the branch has an assigned auditor
-
-"""
+    # 3. Nothing to report if the issue was fixed for this number just now
+    # (or on a date nobody knows); an older fix means it came back, so it is reported again
+    category = SOLVED_CATEGORY_BY_REPORT_TYPE.get(get_report_type(issue))
+    fixed_on = STORAGE.search_solved(normalize_ethiopian_phone(formatted_phone)).get(category, ())
+    if fixed_since(fixed_on, datetime.date.today().toordinal() - RECENT_FIX_DAYS):
+        context.user_data.clear()
         await update.message.reply_text(
-            response,  parse_mode="Markdown",
-            reply_markup=get_main_keyboard()
+            f"✅ **Already Fixed**\n\n"
+            f"📱 **Phone:** `{formatted_phone}`\n"
+            f"📝 **Type:** {issue}\n"
+            f"📅 **Fixed on:** {', '.join(format_fix_date(d) for d in fixed_on)}\n\n"
+            "This issue was already resolved, no new report was added.",
+            parse_mode="Markdown",
+            reply_markup=MAIN_KEYBOARD
         )
         return
-        
-    # When OTP is not reaching to the customer's mobile
-    elif user_message == "When OTP is not reaching to the customer's mobile":
-        response = """
-📱 When OTP is not reaching the customer's mobile
-
-1️⃣ Verify SMS reception
-
-Confirm if the customer receives SMS from any sender.
-
-2️⃣ Check sender-specific blocking
-
-If other SMS are received, verify whether messages from Anbesabank / LIB / 8803 are blocked on the customer’s device.
-
-If blocked, unblock immediately.
-
-3️⃣ Ensure phone accessibility
 
-If not blocked, confirm the customer’s phone is reachable for both calls and SMS (network coverage, SIM active, not in airplane mode).
+    # 4. Save to CSV and Clear state and temp data AFTER
+    saved = save_report_to_file(name, formatted_phone, issue)
+    context.user_data.clear()
 
-4️⃣ Validate head office SMS service
-
-If all above checks pass, confirm whether SMS service is temporarily stopped at the Head Office.
-
-⚠️ Note: This occurs in <2% of cases, so check steps 1–3 first.
-"""
-        await context.bot.send_message(
-    chat_id=update.effective_chat.id, 
-    text=response,
-    reply_markup=get_main_keyboard()
-)
+    if not saved:
+        await update.message.reply_text(
+            f"ℹ️ **Already Reported Today**\n\n"
+            f"📱 **Phone:** `{formatted_phone}`\n"
+            f"📝 **Type:** {issue}\n\n"
+            "This number is already queued for today, no new report was added.",
+            parse_mode="Markdown",
+            reply_markup=MAIN_KEYBOARD
+        )
         return
+    
+    earlier_fixes = ""
+    if fixed_on:
+        earlier_fixes = f"\n🔁 **Fixed before on:** {', '.join(format_fix_date(d) for d in fixed_on)}"
+    await update.message.reply_text(
+        f"🚀 **Issue Reported Successfully**\n\n"
+        f"👤 **Full Name:** {name}\n"
+        f"📱 **Phone:** `{formatted_phone}`\n"
+        f"📝 **Type:** {issue}"
+        f"{earlier_fixes}",
+        parse_mode="Markdown",
+        reply_markup=MAIN_KEYBOARD
+    )
 
-    # ALREADY EXISTING PHONE NO
-    elif user_message == "ALREADY EXISTING PHONE NO":
-        response = """
-When a customer’s status shows *“ALREADY EXISTING PHONE NO”*, it means they tried to set up Digital Access but didn’t finish, for different reasons. First Branches must check if the phone number is in the DBS backoffice. If it doesn’t exist in the DBS backoffice , follow these steps
-
-- 	If the customer forgot their password, they cannot fix it themselves. They must wait for us to reset it so they can start fresh.
-
-- 	To reset, Third-Level Support (IT–Digital Banking) checks whether the customer has already clicked “Forgot Password” and been disabled.
-
-- 	So, the customer must first initiate *“Forgot Password.”*
+# ===== ROUTING TABLES =====
+# Buttons that always win, even in the middle of a report (they reset any state)
+PRIORITY_ROUTES = {
+    "🔙 Back": back_to_main_menu,
+    "🏠 Main Menu": back_to_main_menu,
+    "Report Issue": report_issue_menu,
+    "Reported And Fixed Issues": reported_and_fixed_issues_menu,
+    "Fixed Phone Number Already Exists Issues": search_fixed_phone_exists,
+    "Fixed Blocked User/Account Issues": search_fixed_blocked_users,
+    '"Fixed Automatically Returning to Login Screen Issues"': search_fixed_automatic_return,
+    "Fixed Issues in All Categories": search_fixed_all_categories,
+    "Phone Number Already Exists": report_phone_exists,
+    "Blocked User/Account": report_blocked_user,
+    '"Automatically Returning to Login Screen"': report_automatic_return,
+}
 
-- 	After that, they need to wait until IT–Digital Banking completes the reset. This is done for all affected customers at once, not individually.
+# Reporting/search states -> handler of the next typed message
+STATE_HANDLERS = {
+    "WAITING_FOR_SEARCH": handle_search_input,
+    "WAITING_FOR_NAME": handle_name_input,
+    "WAITING_FOR_PHONE": handle_phone_input,
+}
 
-⚠️ Note: IT–Digital Banking usually performs this reset at least twice a week.
+# Main keyboard buttons with code behind them, only reached when no state is waiting for input.
+# The static answers come from content/responses.toml (CONTENT_ROUTES).
+MENU_ROUTES = {
+    "/help": help_command,
+}
 
-"""
+# ===== CONTENT REGISTRY =====
+CONTENT_PATH = os.getenv("CONTENT_PATH", "content/responses.toml")
+# Seconds between two checks of CONTENT_PATH for edits
+CONTENT_WATCH_INTERVAL = float(os.getenv("CONTENT_WATCH_INTERVAL", "5"))
+# Holds button text -> handler sending its StaticReply, swapped whole on reload
+CONTENT_ROUTES = {}
+# mtime of the CONTENT_PATH version in use
+CONTENT_MTIME = None
+
+PARSE_MODES = {None, "Markdown", "MarkdownV2", "HTML"}
+SEND_MODES = {"reply", "message", "quote"}
+
+class StaticReply(NamedTuple):
+    """A ready-to-send answer from the content file"""
+    text: str
+    parse_mode: Optional[str]
+    keyboard: Optional[ReplyKeyboardMarkup]
+    send: str
+    media: Optional[str]
+
+async def send_static_reply(reply: StaticReply, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if reply.media:
+        await send_cached_file(update, reply.media, caption=reply.text, parse_mode=reply.parse_mode)
+    elif reply.send == "reply":
+        await update.message.reply_text(reply.text, parse_mode=reply.parse_mode, reply_markup=reply.keyboard)
+    else:
         await context.bot.send_message(
-    chat_id=update.effective_chat.id, 
-    text=response,parse_mode="Markdown",
-    reply_markup=get_main_keyboard(),
-    reply_to_message_id=update.message.message_id
-)
-        return
-    
-    # Designation of Digital Ambassador at Branches
-    elif user_message == "Designation of Digital Ambassador at Branches":
-        caption='''Dear colleagues,
-In accordance with the attached internal memo, please designate one representative for each branch. Kindly note that GRO has already completed this exercise at the district level and provided us with district-by-district lists.
+            chat_id=update.effective_chat.id,
+            text=reply.text,
+            parse_mode=reply.parse_mode,
+            reply_markup=reply.keyboard,
+            reply_to_message_id=update.message.message_id if reply.send == "quote" else None
+        )
 
-While we have received responses from some branches, we now require a consolidated list covering all branches.
+def parse_content(data):
+    """Validate the parsed content file and build button -> handler"""
+    keyboards = {"main": MAIN_KEYBOARD, "app_download": APP_DOWNLOAD_MENU, "none": None}
+    allowed = {"button", "text", "parse_mode", "keyboard", "send", "media"}
+    routes = {}
+    for number, entry in enumerate(data.get("response", []), start=1):
+        button = entry.get("button")
+        where = f"response #{number} ({button!r})"
+        if not isinstance(button, str) or not button:
+            raise ValueError(f"{where}: button is missing")
+        if not isinstance(entry.get("text"), str) or not entry["text"].strip():
+            raise ValueError(f"{where}: text is missing")
+        if set(entry) - allowed:
+            raise ValueError(f"{where}: unknown keys {sorted(set(entry) - allowed)}")
+        if button in routes or button in PRIORITY_ROUTES or button in MENU_ROUTES:
+            raise ValueError(f"{where}: button is already handled")
+        if entry.get("parse_mode") not in PARSE_MODES:
+            raise ValueError(f"{where}: parse_mode must be one of Markdown, MarkdownV2, HTML")
+        if entry.get("keyboard", "main") not in keyboards:
+            raise ValueError(f"{where}: keyboard must be one of {sorted(keyboards)}")
+        if entry.get("send", "reply") not in SEND_MODES:
+            raise ValueError(f"{where}: send must be one of {sorted(SEND_MODES)}")
+        if "media" in entry and entry["media"] not in MEDIA_FILES:
+            raise ValueError(f"{where}: media must be one of {sorted(MEDIA_FILES)}")
+        # Telegram limits for captions and messages
+        limit = 1024 if "media" in entry else 4096
+        if len(entry["text"]) > limit:
+            raise ValueError(f"{where}: text is longer than {limit} characters")
+        reply = StaticReply(
+            text=entry["text"],
+            parse_mode=entry.get("parse_mode"),
+            keyboard=keyboards[entry.get("keyboard", "main")],
+            send=entry.get("send", "reply"),
+            media=entry.get("media"),
+        )
+        routes[button] = partial(send_static_reply, reply)
+    return routes
 
-Your prompt cooperation in providing this information will be greatly appreciated.
-'''
-        await send_cached_file(update, "digital_ambassador_pdf", caption=caption,parse_mode="Markdown")
-        return
+def load_content():
+    """(Re)load CONTENT_PATH; a broken file keeps the answers in use"""
+    global CONTENT_ROUTES, CONTENT_MTIME
+    try:
+        mtime = os.stat(CONTENT_PATH).st_mtime_ns
+        with open(CONTENT_PATH, "rb") as f:
+            routes = parse_content(tomllib.load(f))
+    except (OSError, ValueError) as e:
+        print(f"Error loading {CONTENT_PATH}: {e}")
+        return False
+    # One assignment, so a handler never sees half of the new content
+    CONTENT_ROUTES = routes
+    CONTENT_MTIME = mtime
+    print(f"Loaded {len(routes)} responses from {CONTENT_PATH}")
+    return True
+
+async def watch_content():
+    """Reload CONTENT_PATH when it changes"""
+    while True:
+        await asyncio.sleep(CONTENT_WATCH_INTERVAL)
+        try:
+            if os.stat(CONTENT_PATH).st_mtime_ns != CONTENT_MTIME:
+                load_content()
+        except OSError as e:
+            print(f"Error checking {CONTENT_PATH}: {e}")
+
+load_content()
+
+def get_route_handler(user_message, state):
+    """Reset buttons first, then the active state, then the menus: one dict lookup each"""
+    handler = PRIORITY_ROUTES.get(user_message)
+    if handler is None:
+        handler = STATE_HANDLERS.get(state)
+    if handler is None:
+        handler = MENU_ROUTES.get(user_message) or CONTENT_ROUTES.get(user_message)
+    if handler is None and user_message.lower() == "help":
+        handler = help_command
+    return handler
+
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle all text messages, button clicks, and reporting states"""
+    handler = get_route_handler(update.message.text, context.user_data.get("state"))
+    if handler is not None:
+        # Content file answers are partials without a name, labelled by their button
+        route = getattr(handler, "__name__", None) or f"content:{update.message.text}"
+        started = time.perf_counter()
+        try:
+            await handler(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc((route,))
+            raise
+        finally:
+            HANDLER_SECONDS.observe((route,), time.perf_counter() - started)
 
-    # Help command from keyboard
-    elif user_message == "/help" or user_message.lower() == "help":
-        await help_command(update, context)
-        return
-    
 async def new_chat_members(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send welcome when bot is added to a group"""
     for member in update.message.new_chat_members:
@@ -1057,7 +2102,7 @@ async def new_chat_members(update: Update, context: ContextTypes.DEFAULT_TYPE):
 To start: Type /start or select from menu below"""
             await update.message.reply_text(
                 welcome_text,
-                reply_markup=get_main_keyboard()
+                reply_markup=MAIN_KEYBOARD
             )
             logger.info(f"Bot added to group: {update.effective_chat.title}")
         return
@@ -1083,19 +2128,265 @@ async def handle_callback_query(update, context):
             parse_mode="Markdown"
         )
 
+# ===== CONVERSATION PERSISTENCE =====
+# SQLite file keeping each user's reporting/search state across restarts
+PERSISTENCE_PATH = os.getenv("PERSISTENCE_PATH", "data/user_data.sqlite3")
+# Seconds between two batched writes of the changed user_data
+PERSISTENCE_INTERVAL = float(os.getenv("PERSISTENCE_INTERVAL", "10"))
+
+class BatchedUserDataPersistence(BasePersistence):
+    """
+    Keeps user_data in SQLite. Every update_interval seconds PTB hands over
+    the users changed since its last run; they are written together in one
+    transaction, so no message waits for the disk.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS user_data (
+        user_id INTEGER PRIMARY KEY,
+        data TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, path, update_interval):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Shared by the event loop and the writer thread, guarded by self.lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        # Holds user_id -> user_data as JSON (None to delete) until the next write
+        self.dirty = {}
+        self.writer = None
+
+    async def get_user_data(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT user_id, data FROM user_data").fetchall()
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    async def update_user_data(self, user_id, data):
+        # Serialized now, the dict keeps changing while the write waits
+        self.mark_dirty(user_id, json.dumps(data) if data else None)
+
+    async def drop_user_data(self, user_id):
+        self.mark_dirty(user_id, None)
+
+    def mark_dirty(self, user_id, data):
+        self.dirty[user_id] = data
+        # All users of one PTB persistence run arrive before the writer gets to run
+        if self.writer is None:
+            self.writer = asyncio.create_task(self.write_dirty())
+
+    async def write_dirty(self):
+        try:
+            await asyncio.sleep(0)
+            # Users changed during a write go into the next batch, written in order
+            while self.dirty:
+                batch, self.dirty = self.dirty, {}
+                try:
+                    await asyncio.to_thread(self.write_batch, batch)
+                except Exception:
+                    logger.exception(f"Error writing user_data of {len(batch)} user(s), kept for the next write")
+                    # Changes made since the batch was taken are newer, they win
+                    self.dirty = {**batch, **self.dirty}
+                    return
+        finally:
+            self.writer = None
+
+    def write_batch(self, batch):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO user_data (user_id, data) VALUES (?, ?)",
+                [(user_id, data) for user_id, data in batch.items() if data is not None]
+            )
+            self.conn.executemany(
+                "DELETE FROM user_data WHERE user_id = ?",
+                [(user_id,) for user_id, data in batch.items() if data is None]
+            )
+
+    async def flush(self):
+        if self.writer is not None:
+            await self.writer
+        if self.dirty:
+            batch, self.dirty = self.dirty, {}
+            self.write_batch(batch)
+
+    # Only user_data is stored
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+# ===== UPDATE PROCESSING =====
+# How many updates run their handlers at the same time
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "16"))
+
+class UserOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Runs updates of different users concurrently, but one at a time per user,
+    so a user's reporting steps in user_data never interleave. Users of the
+    same group do not wait for each other.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        # The base class semaphore only bounds the updates waiting for their
+        # user; max_concurrent_updates applies to the running ones
+        super().__init__(max_concurrent_updates * 16)
+        self.running = asyncio.Semaphore(max_concurrent_updates)
+        # Holds ("user" | "chat", id) -> [lock, updates holding or waiting for it]
+        self.locks = {}
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @asynccontextmanager
+    async def lock(self, key):
+        entry = self.locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        key = None
+        if isinstance(update, Update):
+            if update.effective_user:
+                key = ("user", update.effective_user.id)
+            elif update.effective_chat:
+                # Channel posts and the like have no user
+                key = ("chat", update.effective_chat.id)
+        if key is None:
+            async with self.running:
+                await coroutine
+            return
+        async with self.lock(key):
+            async with self.running:
+                await coroutine
+
+# ===== BACKGROUND TASKS =====
+# Holds tasks that live as long as the application
+BACKGROUND_TASKS = []
+
+async def post_init(application: Application):
+    """Start the background tasks once the bot is initialized"""
+    # initialize() already fetched the bot's identity with a single get_me()
+    render_deep_links(application.bot.username)
+    print(f"Running as @{application.bot.username}")
+    global REPORT_QUEUE
+    REPORT_QUEUE = asyncio.Queue()
+    BACKGROUND_TASKS.append(asyncio.create_task(report_writer()))
+    BACKGROUND_TASKS.append(asyncio.create_task(watch_solved_files()))
+    BACKGROUND_TASKS.append(asyncio.create_task(watch_content()))
+    if METRICS_PORT:
+        BACKGROUND_TASKS.append(asyncio.create_task(serve_metrics()))
+
+async def post_shutdown(application: Application):
+    """Stop the background tasks"""
+    for task in BACKGROUND_TASKS:
+        task.cancel()
+    await asyncio.gather(*BACKGROUND_TASKS, return_exceptions=True)
+    BACKGROUND_TASKS.clear()
+    global REPORT_QUEUE
+    REPORT_QUEUE = None
+
 # ===== MAIN FUNCTION =====
 def main():
     """Start the bot"""
     print("=" * 50)
     print("STARTING AnbesaPLUS HELPER BOT")
     print("=" * 50)
+    if BOT_MODE not in ("polling", "webhook"):
+        raise ValueError(f"BOT_MODE must be polling or webhook, not {BOT_MODE!r}")
+    if BOT_MODE == "webhook" and not (WEBHOOK_URL and WEBHOOK_SECRET):
+        raise ValueError("BOT_MODE=webhook needs WEBHOOK_URL and WEBHOOK_SECRET")
+
+    global STORAGE
+    STORAGE = open_storage()
+    SOLVED_FILES.update(STORAGE.load_solved_files())
+    refresh_solved_index()
+    load_reported_today(datetime.date.today().isoformat())
+    PENDING.load()
     
     # 1. Create application
-    application = Application.builder().token(BOT_TOKEN).build()
-    
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .base_url(BOT_API_BASE_URL)
+        .base_file_url(BOT_API_BASE_FILE_URL)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(UserOrderedUpdateProcessor(UPDATE_CONCURRENCY))
+        .persistence(BatchedUserDataPersistence(PERSISTENCE_PATH, PERSISTENCE_INTERVAL))
+        .build()
+    )
+    register_handlers(application)
+
+    print(f"Bot is running ({BOT_MODE})...")
+    print("=" * 50)
+    if BOT_MODE == "webhook":
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES
+        )
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+
+def register_handlers(application: Application):
+    """Add the bot's handlers to application"""
     # 2. Add command handlers
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("warmup", warm_up_command))
+    application.add_handler(CommandHandler("pending", pending_command))
+    application.add_handler(CommandHandler("profile", profile_command))
     
     # 3. Handle when bot is added to group
     application.add_handler(MessageHandler(
@@ -1111,15 +2402,26 @@ def main():
     ))
     # 5. Add error handler
     application.add_error_handler(error_handler)
-    
-    print("Bot is running...")
-    print("=" * 50)
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 # ===== START THE BOT =====
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="AnbesaPlus Helper Bot")
+    parser.add_argument(
+        "--import-csv", action="store_true",
+        help="import the reports/ and solved/ CSV history into SQLITE_PATH and exit"
+    )
+    parser.add_argument(
+        "--warm-up", action="store_true",
+        help="upload all media to CACHE_CHAT_ID, store their file_ids and exit"
+    )
+    args = parser.parse_args()
     try:
-        main()
+        if args.import_csv:
+            import_csv_history()
+        elif args.warm_up:
+            asyncio.run(warm_up_cli())
+        else:
+            main()
     except KeyboardInterrupt:
         print("\nBot stopped by user")
     except Exception as e:
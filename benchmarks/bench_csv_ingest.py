@@ -0,0 +1,97 @@
+"""
+Startup time and peak memory of the solved/ CSV ingest: the old pandas
+path against the stdlib csv path used by Telegram_Bot.py.
+
+Usage (from the repository root):
+    python benchmarks/bench_csv_ingest.py --rows 200000
+
+Each path runs in its own child process so imports and peak RSS are
+measured from a clean interpreter.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, resource, sys, time
+sys.path.insert(0, ROOT)
+start = time.perf_counter()
+# The old module additionally imported pandas at load time
+from Telegram_Bot import read_solved_rows
+if MODE == "pandas":
+    import pandas as pd
+imported = time.perf_counter()
+
+if MODE == "pandas":
+    # The ingest as it was before: read_csv + row-wise apply
+    def normalize_ethiopian_phone(phone):
+        if not phone or pd.isna(phone):
+            return ""
+        return "".join(filter(str.isdigit, str(phone)))[-9:]
+
+    df = pd.read_csv(PATH, dtype=str)
+    df.columns = [c.strip() for c in df.columns]
+    phones = df["Phone Number"].apply(lambda x: normalize_ethiopian_phone(str(x))).tolist()
+else:
+    phones = read_solved_rows(PATH)[0]
+done = time.perf_counter()
+
+print(json.dumps({
+    "import_s": imported - start,
+    "ingest_s": done - imported,
+    "rows": len(phones),
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+'''
+
+
+def write_dataset(path, rows):
+    prefixes = ["+2519", "09", "2517", "07"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write("Phone Number \r\n")
+        for _ in range(rows):
+            f.write(f"{random.choice(prefixes)}{random.randrange(10**8):08d}\r\n")
+
+
+def run(mode, path):
+    code = f"ROOT = {ROOT!r}\nMODE = {mode!r}\nPATH = {path!r}\n" + CHILD
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=tempfile.gettempdir(),
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "Blocked_Users_.csv")
+        write_dataset(path, args.rows)
+        print(f"{args.rows} rows, best of {args.repeat} runs")
+        print(f"{'path':<8}{'import s':>10}{'ingest s':>10}{'peak RSS MB':>13}")
+        for mode in ("pandas", "csv"):
+            try:
+                results = [run(mode, path) for _ in range(args.repeat)]
+            except subprocess.CalledProcessError as e:
+                print(f"{mode:<8} failed: {e.stderr.strip().splitlines()[-1]}")
+                continue
+            print(
+                f"{mode:<8}"
+                f"{min(r['import_s'] for r in results):>10.3f}"
+                f"{min(r['ingest_s'] for r in results):>10.3f}"
+                f"{min(r['peak_rss_mb'] for r in results):>13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
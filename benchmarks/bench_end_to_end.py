@@ -0,0 +1,175 @@
+"""
+End-to-end throughput and tail latency of the running bot (run_polling)
+with thousands of simulated users, against the local fake Bot API.
+
+Usage (from the repository root):
+    python benchmarks/bench_end_to_end.py --users 2000 --messages 5 --think 2 --latency 20
+
+Telegram_Bot.py is started as its own process, the way it is deployed,
+in a temporary directory holding the content file, the media (missing
+videos are replaced by --media-kb of filler) and nothing else, so
+reports/, solved/ and data/ start out empty. BOT_API_BASE_URL points it at fake_bot_api.FakeBotApi, served
+in this process.
+
+Each user waits for the answer to a message, thinks for an exponentially
+distributed time (mean --think seconds) and sends the next one: a content
+button, a button answered with a video or PDF (uploaded the first time,
+sent by file_id afterwards), the report menu, or an .exe posted in a group
+that the bot deletes. An update is timed from the moment it is queued for
+getUpdates until the first sendMessage/sendVideo/sendDocument/deleteMessage
+for its chat reaches the fake API; with --error-rate or --flood-rate some
+of those calls fail and their update is counted as unanswered after
+--reply-timeout seconds. The users and the fake API share the machine
+with the bot, so give it a spare CPU core for numbers that hold.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import signal
+import statistics
+import sys
+import tempfile
+import time
+import tomllib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import Telegram_Bot as bot  # noqa: E402
+from common import TOKEN, percentile  # noqa: E402
+from fake_bot_api import API_PORT, FakeBotApi, make_app  # noqa: E402
+
+
+def prepare_directory(tmp, media_kb):
+    """Working directory of the bot; returns the content buttons without and with media"""
+    os.symlink(os.path.join(ROOT, "content"), os.path.join(tmp, "content"))
+    os.makedirs(os.path.join(tmp, "responses", "videos"))
+    os.symlink(os.path.join(ROOT, "responses", "thumbnails"), os.path.join(tmp, "responses", "thumbnails"))
+    for path in bot.MEDIA_FILES.values():
+        path = os.path.normpath(path)
+        source = os.path.join(ROOT, path)
+        if os.path.exists(source):
+            os.symlink(source, os.path.join(tmp, path))
+        else:
+            with open(os.path.join(tmp, path), "wb") as f:
+                f.write(os.urandom(media_kb * 1024))
+    with open(os.path.join(ROOT, "content", "responses.toml"), "rb") as f:
+        responses = tomllib.load(f)["response"]
+    return (
+        [response["button"] for response in responses if "media" not in response],
+        [response["button"] for response in responses if "media" in response],
+    )
+
+
+class Users:
+    """Simulated users and the replies they are waiting for"""
+
+    def __init__(self, api, buttons, media_buttons, reply_timeout):
+        self.api = api
+        self.buttons = buttons
+        self.media_buttons = media_buttons
+        self.reply_timeout = reply_timeout
+        self.latencies = []
+        self.unanswered = 0
+
+    def make_update(self, user_id):
+        sender = {"id": user_id, "is_bot": False, "first_name": "User"}
+        message = {"date": int(time.time()), "from": sender, "message_id": 1}
+        draw = random.random()
+        if draw < 0.1:
+            # Deleted by the bot, which then warns the group
+            message["chat"] = {"id": -user_id, "type": "group", "title": "Branch"}
+            message["document"] = {"file_id": "exe", "file_unique_id": "exe", "file_name": "setup.exe"}
+        else:
+            message["chat"] = {"id": user_id, "type": "private"}
+            if draw < 0.3:
+                message["text"] = random.choice(self.media_buttons)
+            elif draw < 0.4:
+                message["text"] = "Report Issue"
+            else:
+                message["text"] = random.choice(self.buttons)
+        return {"message": message}
+
+    async def run_user(self, user_id, messages, think):
+        for _ in range(messages):
+            await asyncio.sleep(random.expovariate(1 / think))
+            update = self.make_update(user_id)
+            chat_id = update["message"]["chat"]["id"]
+            reply = self.api.reply_for(chat_id)
+            sent = time.perf_counter()
+            self.api.push_update(update)
+            try:
+                async with asyncio.timeout(self.reply_timeout):
+                    self.latencies.append(await reply - sent)
+            except TimeoutError:
+                self.api.replies.pop(chat_id, None)
+                self.unanswered += 1
+
+
+async def run(args):
+    logging.getLogger("tornado.access").setLevel(logging.WARNING)
+    api = FakeBotApi(
+        args.latency / 1000, args.jitter / 1000, args.error_rate, args.flood_rate, args.retry_after
+    )
+    server = make_app(api).listen(API_PORT, address="127.0.0.1")
+    with tempfile.TemporaryDirectory() as tmp:
+        buttons, media_buttons = prepare_directory(tmp, args.media_kb)
+        env = dict(
+            os.environ, BOT_TOKEN=TOKEN, BOT_MODE="polling", METRICS_PORT="0",
+            BOT_API_BASE_URL=f"http://127.0.0.1:{API_PORT}/bot",
+            BOT_API_BASE_FILE_URL=f"http://127.0.0.1:{API_PORT}/file/bot",
+        )
+        with open(os.path.join(tmp, "bot.log"), "wb") as log:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.join(ROOT, "Telegram_Bot.py"), cwd=tmp, env=env, stdout=log, stderr=log
+            )
+            try:
+                async with asyncio.timeout(30):
+                    await api.polled.wait()
+                users = Users(api, buttons, media_buttons, args.reply_timeout)
+                started = time.perf_counter()
+                await asyncio.gather(*(
+                    users.run_user(user_id, args.messages, args.think) for user_id in range(1, args.users + 1)
+                ))
+                seconds = time.perf_counter() - started
+            finally:
+                process.send_signal(signal.SIGINT)
+                api.close()
+                await process.wait()
+        server.stop()
+
+    latencies = sorted(users.latencies)
+    print(
+        f"{args.users} users x {args.messages} messages, {args.think} s think time, "
+        f"{args.latency} ms (+{args.jitter}) API latency, {args.error_rate:.1%} errors, {args.flood_rate:.1%} 429s"
+    )
+    print(f"answered      {len(latencies)} in {seconds:.1f} s, {len(latencies) / seconds:.0f} updates/s")
+    print(f"unanswered    {users.unanswered}")
+    if latencies:
+        print(
+            f"latency ms    p50 {percentile(latencies, 0.50) * 1e3:.1f}  p95 {percentile(latencies, 0.95) * 1e3:.1f}"
+            f"  p99 {percentile(latencies, 0.99) * 1e3:.1f}  max {latencies[-1] * 1e3:.1f}"
+            f"  mean {statistics.mean(latencies) * 1e3:.1f}"
+        )
+    print("API calls    ", ", ".join(f"{name} {count}" for name, count in sorted(api.counts.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=5, help="per user")
+    parser.add_argument("--think", type=float, default=2, help="mean seconds between a reply and the next message")
+    parser.add_argument("--latency", type=float, default=20, help="milliseconds added to every API answer")
+    parser.add_argument("--jitter", type=float, default=10, help="up to this many more milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--flood-rate", type=float, default=0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--reply-timeout", type=float, default=10, help="seconds before an update counts as unanswered")
+    parser.add_argument("--media-kb", type=int, default=512, help="size of the filler for missing videos")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Offline throughput of the bot's handlers: synthetic updates replayed
+through the real Application and handlers, with the Bot API stubbed out.
+
+Usage (from the repository root):
+    python benchmarks/bench_handlers.py --rows 1000000 --number 300
+
+A generated solved/ dataset of --rows numbers (spread over the solved
+categories and dates) and an empty reports/ live in a temporary directory.
+Every path is driven through Application.process_update(), so filters,
+routing, handlers, python-telegram-bot's request building and JSON
+serialization all run; only the HTTP round trip is replaced by StubRequest,
+which answers instantly with canned Bot API results.
+
+For each path it prints updates/s, latency percentiles, the peak memory
+allocated while one update runs and the memory still held afterwards.
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Module level media and content paths are relative to the repository
+os.chdir(ROOT)
+
+from telegram import Update  # noqa: E402
+from telegram.ext import Application  # noqa: E402
+from telegram.request import BaseRequest  # noqa: E402
+
+import Telegram_Bot as bot  # noqa: E402
+from common import TOKEN, percentile  # noqa: E402
+from fake_bot_api import BOT_USER  # noqa: E402
+
+
+class StubRequest(BaseRequest):
+    """Answers every Bot API call at once, without network"""
+
+    def __init__(self, csv_upload=b""):
+        self.csv_upload = csv_upload
+        self.message_id = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        if "/file/bot" in url:
+            # Download of a document sent by a user
+            return 200, self.csv_upload
+        params = request_data.parameters if request_data else {}
+        api_method = url.rsplit("/", 1)[-1]
+        if api_method == "getMe":
+            result = BOT_USER
+        elif api_method == "getFile":
+            result = {"file_id": params["file_id"], "file_unique_id": "u", "file_path": "documents/numbers.csv"}
+        elif api_method.startswith(("send", "edit")):
+            self.message_id += 1
+            result = {
+                "message_id": self.message_id, "date": 0,
+                "chat": {"id": int(params.get("chat_id", 1)), "type": "private"},
+                "text": params.get("text", ""),
+            }
+            if api_method == "sendDocument":
+                result["document"] = {"file_id": "document", "file_unique_id": "d"}
+            elif api_method == "sendVideo":
+                result["video"] = {"file_id": "video", "file_unique_id": "v", "width": 1, "height": 1, "duration": 1}
+        else:
+            # answerCallbackQuery, deleteMessage, ...
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def write_dataset(rows):
+    """solved/ files over every category and 30 dates; returns a sample of the numbers"""
+    files = [(category, datetime.date(2026, 1, 1) + datetime.timedelta(days=day))
+             for category in bot.SOLVED_CATEGORIES for day in range(30)]
+    sample = []
+    os.makedirs("solved")
+    per_file = rows // len(files)
+    for category, date in files:
+        with open(f"solved/{category}_{date.isoformat()}.csv", "w", newline="") as f:
+            f.write("Phone Number\r\n")
+            for _ in range(per_file):
+                phone = f"09{random.randrange(10**8):08d}"
+                f.write(phone + "\r\n")
+                if len(sample) < 1000 and random.random() < 0.01:
+                    sample.append(phone)
+    return sample
+
+
+class Updates:
+    """Builds update dicts the way Telegram would send them"""
+
+    def __init__(self):
+        self.update_id = 0
+
+    def make(self, user_id, chat_type="private", **payload):
+        self.update_id += 1
+        chat = {"id": user_id if chat_type == "private" else -1000, "type": chat_type}
+        sender = {"id": user_id, "is_bot": False, "first_name": "Bench"}
+        if "callback_data" in payload:
+            return {"update_id": self.update_id, "callback_query": {
+                "id": str(self.update_id), "from": sender, "chat_instance": "c",
+                "data": payload["callback_data"],
+                "message": {"message_id": 1, "date": 0, "chat": chat, "text": "result"},
+            }}
+        message = {"message_id": self.update_id, "date": 0, "chat": chat, "from": sender}
+        message.update(payload)
+        return {"update_id": self.update_id, "message": message}
+
+    def text(self, user_id, text, chat_type="private"):
+        return self.make(user_id, chat_type, text=text)
+
+    def document(self, user_id, file_name, chat_type="private"):
+        return self.make(user_id, chat_type, document={
+            "file_id": f"doc{self.update_id}", "file_unique_id": "d", "file_name": file_name, "file_size": 2048,
+        })
+
+
+def build_paths(updates, sample):
+    """name -> function(user_id) returning [(step name, update dict)] for one run of that path"""
+    hit = lambda: random.choice(sample)  # noqa: E731
+    phone = lambda: f"09{random.randrange(10**8):08d}"  # noqa: E731
+    paths = {
+        "menu: static answer": lambda u: [("menu: static answer", updates.text(u, random.choice(list(bot.CONTENT_ROUTES))))],
+        "menu: main menu": lambda u: [("menu: main menu", updates.text(u, "🏠 Main Menu"))],
+        "menu: report (group)": lambda u: [("menu: report (group)", updates.text(u, "Report Issue", "group"))],
+        "report flow": lambda u: [
+            ("report: choose type", updates.text(u, "Blocked User/Account")),
+            ("report: name", updates.text(u, "Abebe Kebede")),
+            ("report: phone", updates.text(u, phone())),
+        ],
+        "search flow": lambda u: [
+            ("search: choose category", updates.text(u, "Fixed Blocked User/Account Issues")),
+            ("search: phone (hit)", updates.text(u, hit())),
+            ("search: callback again", updates.make(u, callback_data="search_Blocked_Users")),
+            ("search: phone (miss)", updates.text(u, phone())),
+        ],
+        "search all categories": lambda u: [
+            ("search all: choose", updates.text(u, "Fixed Issues in All Categories")),
+            ("search all: phone", updates.text(u, hit())),
+        ],
+        "bulk search": lambda u: [
+            ("bulk: choose category", updates.text(u, "Fixed Blocked User/Account Issues")),
+            ("bulk: 50 pasted numbers", updates.text(u, "\n".join(hit() if i % 2 else phone() for i in range(50)))),
+            ("bulk: choose category", updates.text(u, "Fixed Blocked User/Account Issues")),
+            ("bulk: csv document", updates.document(u, "numbers.csv")),
+        ],
+        "document: blocked .exe": lambda u: [("document: blocked .exe", updates.document(u, "setup.exe", "group"))],
+    }
+    return paths
+
+
+async def run_path(application, make_steps, number, first_user, trace):
+    """Runs a path `number` times; returns step -> [(seconds, peak bytes)] and the bytes retained"""
+    results = {}
+    if trace:
+        tracemalloc.start()
+        retained_start = tracemalloc.get_traced_memory()[0]
+    for i in range(number):
+        for step, data in make_steps(first_user + i):
+            update = Update.de_json(data, application.bot)
+            if trace:
+                baseline = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            started = time.perf_counter()
+            await application.process_update(update)
+            seconds = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] - baseline if trace else 0
+            results.setdefault(step, []).append((seconds, peak))
+    retained = 0
+    if trace:
+        retained = tracemalloc.get_traced_memory()[0] - retained_start
+        tracemalloc.stop()
+    return results, retained
+
+
+async def run(args):
+    # The bot prints a line for most updates; only the results are shown
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as quiet:
+        os.chdir(tmp)
+        started = time.perf_counter()
+        sample = write_dataset(args.rows)
+        with contextlib.redirect_stdout(quiet):
+            bot.refresh_solved_index()
+            bot.PENDING.load()
+        print(f"{args.rows} solved rows generated and indexed in {time.perf_counter() - started:.1f} s")
+
+        csv_upload = ("Phone Number\n" + "\n".join(random.choice(sample) for _ in range(100))).encode()
+        stub = StubRequest(csv_upload)
+        application = (
+            Application.builder().token(TOKEN).request(stub).get_updates_request(StubRequest()).build()
+        )
+        bot.register_handlers(application)
+        # Media is sent by file_id, as after a warm-up, whether or not the files are here
+        for key, path in bot.MEDIA_FILES.items():
+            bot.FILE_CACHE.setdefault(key, Path(path))
+            bot.FILE_IDS.setdefault(key, key)
+        bot.render_deep_links(BOT_USER["username"])
+        bot.REPORT_QUEUE = asyncio.Queue()
+        writer = asyncio.create_task(bot.report_writer())
+
+        paths = build_paths(Updates(), sample)
+        print(f"{args.number} runs per path, kept B is the memory still held per update of the path")
+        print(f"{'step':<28}{'upd/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak KB':>9}{'kept B':>9}")
+        async with application:
+            for offset, make_steps in enumerate(paths.values()):
+                first_user = 10_000 + offset * 1_000_000
+                with contextlib.redirect_stdout(quiet):
+                    timed, _ = await run_path(application, make_steps, args.number, first_user, trace=False)
+                    traced, retained = await run_path(
+                        application, make_steps, args.trace_number, first_user + 500_000, trace=True
+                    )
+                kept = retained / sum(len(samples) for samples in traced.values())
+                for step, samples in timed.items():
+                    latencies = sorted(seconds for seconds, _ in samples)
+                    peaks = [peak for _, peak in traced[step]]
+                    print(
+                        f"{step:<28}{len(latencies) / sum(latencies):>9.0f}"
+                        f"{percentile(latencies, 0.50) * 1e3:>9.3f}{percentile(latencies, 0.95) * 1e3:>9.3f}"
+                        f"{percentile(latencies, 0.99) * 1e3:>9.3f}{statistics.median(peaks) / 1024:>9.1f}{kept:>9.0f}"
+                    )
+            with contextlib.redirect_stdout(quiet):
+                writer.cancel()
+                await asyncio.gather(writer, return_exceptions=True)
+        os.chdir(ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--number", type=int, default=300, help="timed runs per path")
+    parser.add_argument("--trace-number", type=int, default=50, help="runs per path under tracemalloc")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Allocations per update for reply markups: building the keyboards on every
+reply, as the handlers used to, against the markups built once at import.
+
+Usage (from the repository root):
+    python benchmarks/bench_keyboards.py --updates 20000
+
+A simulated update picks the markup a handler would attach (the main
+keyboard for most replies, the menus, a search result button or a group
+deep link). All markups are kept alive so tracemalloc counts every block
+and byte allocated for them.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Telegram_Bot as bot  # noqa: E402
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # noqa: E402
+
+
+def fresh_markups():
+    """Markup factories as they were: a new object for every reply"""
+    return [
+        bot.get_main_keyboard,
+        bot.get_main_keyboard,
+        bot.get_main_keyboard,
+        bot.get_issue_report_menu,
+        bot.get_reported_and_fixed_issues_menu,
+        bot.get_app_download_menu,
+        lambda: InlineKeyboardMarkup([[InlineKeyboardButton("🔍 Search Another", callback_data="search_Blocked_Users")]]),
+        lambda: InlineKeyboardMarkup([[InlineKeyboardButton("➡️ Start Reporting", url="https://t.me/bench_bot?start=report")]]),
+    ]
+
+
+def shared_markups():
+    """The same mix taken from the prebuilt objects"""
+    return [
+        lambda: bot.MAIN_KEYBOARD,
+        lambda: bot.MAIN_KEYBOARD,
+        lambda: bot.MAIN_KEYBOARD,
+        lambda: bot.ISSUE_REPORT_MENU,
+        lambda: bot.REPORTED_AND_FIXED_ISSUES_MENU,
+        lambda: bot.APP_DOWNLOAD_MENU,
+        lambda: bot.SEARCH_AGAIN_MARKUPS["Blocked_Users"],
+        lambda: bot.DEEP_LINK_MARKUPS["report"],
+    ]
+
+
+def run(factories, updates):
+    markups = []
+    start = time.perf_counter()
+    for i in range(updates):
+        markups.append(factories[i % len(factories)]())
+    return time.perf_counter() - start, markups
+
+
+def measure(factories, updates):
+    seconds, _ = run(factories, updates)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    _, markups = run(factories, updates)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del markups
+    stats = after.compare_to(before, "filename")
+    return seconds, sum(s.count_diff for s in stats), sum(s.size_diff for s in stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=20_000)
+    args = parser.parse_args()
+
+    # Done by post_init once the bot knows its username
+    bot.render_deep_links("bench_bot")
+    print(f"{args.updates} updates")
+    print(f"{'markups':<10}{'us/update':>11}{'blocks/update':>15}{'bytes/update':>14}")
+    for name, factories in (("per call", fresh_markups()), ("shared", shared_markups())):
+        seconds, blocks, size = measure(factories, args.updates)
+        print(
+            f"{name:<10}{seconds / args.updates * 1e6:>11.2f}"
+            f"{blocks / args.updates:>15.1f}{size / args.updates:>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Routing cost per text update: the dict dispatch of handle_message against
+the if/elif chain it replaced.
+
+Usage (from the repository root):
+    python benchmarks/bench_routing.py --number 200000
+
+The chain is rebuilt from the route tables in their original order
+(priority buttons, reporting states, then the main menu and the
+content file answers), comparing the
+text against one literal after another like the old handle_message did.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Telegram_Bot as bot  # noqa: E402
+
+
+def chain_route(user_message, state):
+    """Linear scan in the old branch order"""
+    for text, handler in bot.PRIORITY_ROUTES.items():
+        if user_message == text:
+            return handler
+    for waiting_state, handler in bot.STATE_HANDLERS.items():
+        if state == waiting_state:
+            return handler
+    for routes in (bot.MENU_ROUTES, bot.CONTENT_ROUTES):
+        for text, handler in routes.items():
+            if user_message == text:
+                return handler
+    if user_message.lower() == "help":
+        return bot.help_command
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=200_000)
+    args = parser.parse_args()
+
+    cases = {
+        "first priority button": ("🏠 Main Menu", None),
+        "reporting state": ("Abebe Kebede", "WAITING_FOR_NAME"),
+        "first menu button": ("Digital Access Process", None),
+        "last menu button": ("Designation of Digital Ambassador at Branches", None),
+        "help": ("help", None),
+        "unknown text": ("hello there", None),
+    }
+    print(f"ns per update, {args.number} updates per case")
+    print(f"{'case':<24}{'if/elif':>10}{'dict':>10}")
+    for name, (text, state) in cases.items():
+        assert chain_route(text, state) is bot.get_route_handler(text, state)
+        timings = []
+        for route in (chain_route, bot.get_route_handler):
+            seconds = min(timeit.repeat(lambda: route(text, state), number=args.number, repeat=5))
+            timings.append(seconds / args.number * 1e9)
+        print(f"{name:<24}{timings[0]:>10.0f}{timings[1]:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
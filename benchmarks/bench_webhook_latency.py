@@ -0,0 +1,127 @@
+"""
+Update-to-reply latency of the bot in polling mode against webhook mode,
+with a local fake Telegram Bot API in place of api.telegram.org.
+
+Usage (from the repository root):
+    python benchmarks/bench_webhook_latency.py --updates 200 --api-delay 20 --rate 20
+
+The fake endpoint is fake_bot_api.FakeBotApi. --api-delay adds the same
+delay to every Bot API response and to every webhook delivery, standing
+in for the network distance to Telegram. An update is injected (queued for
+getUpdates, or POSTed to the webhook with the secret token) and timed
+until the bot's sendMessage answer for its chat reaches the fake server.
+With --rate 0 updates are sent one after the other; otherwise they arrive
+at random times at that average rate per second, so some of them land
+while a getUpdates response is already on its way back.
+The bot runs with the real handlers from register_handlers().
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from telegram.ext import Application  # noqa: E402
+
+import Telegram_Bot as bot  # noqa: E402
+from common import TOKEN, percentile  # noqa: E402
+from fake_bot_api import API_PORT, FakeBotApi, make_app  # noqa: E402
+
+SECRET = "bench-secret"
+WEBHOOK_PORT = 8082
+
+
+def make_update(update_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": int(time.time()), "text": "help",
+            "chat": {"id": 1000 + update_id, "type": "private"},
+            "from": {"id": 7, "is_bot": False, "first_name": "Bench"},
+        },
+    }
+
+
+async def deliver(mode, api, client, update_id):
+    """Inject one update and return the seconds until its reply"""
+    update = make_update(update_id)
+    reply = api.reply_for(1000 + update_id)
+    start = time.perf_counter()
+    if mode == "webhook":
+        await asyncio.sleep(api.latency)
+        response = await client.post(
+            f"http://127.0.0.1:{WEBHOOK_PORT}/telegram", json=update,
+            headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}
+        )
+        response.raise_for_status()
+    else:
+        api.push_update(update)
+    return await reply - start
+
+
+async def measure(mode, api, count, rate):
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(f"http://127.0.0.1:{API_PORT}/bot")
+        .build()
+    )
+    bot.register_handlers(application)
+    latencies = []
+    async with application, httpx.AsyncClient() as client:
+        await application.start()
+        if mode == "webhook":
+            await application.updater.start_webhook(
+                listen="127.0.0.1", port=WEBHOOK_PORT, url_path="telegram",
+                webhook_url=f"http://127.0.0.1:{WEBHOOK_PORT}/telegram", secret_token=SECRET
+            )
+        else:
+            await application.updater.start_polling(poll_interval=0, timeout=10)
+        if rate:
+            tasks = []
+            for update_id in range(1, count + 1):
+                tasks.append(asyncio.create_task(deliver(mode, api, client, update_id)))
+                await asyncio.sleep(random.expovariate(rate))
+            latencies = await asyncio.gather(*tasks)
+        else:
+            for update_id in range(1, count + 1):
+                latencies.append(await deliver(mode, api, client, update_id))
+        await application.updater.stop()
+        await application.stop()
+    if mode == "polling":
+        api.close()
+    return latencies
+
+
+async def run(args):
+    for name in ("httpx", "tornado.access", "telegram"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    api = FakeBotApi(args.api_delay / 1000)
+    server = make_app(api).listen(API_PORT, address="127.0.0.1")
+    print(f"{args.updates} updates, {args.api_delay} ms Bot API delay, rate {args.rate or 'sequential'}")
+    print(f"{'mode':<9}{'median ms':>11}{'p95 ms':>9}{'max ms':>9}")
+    for mode in ("polling", "webhook"):
+        latencies = sorted(await measure(mode, api, args.updates, args.rate))
+        print(
+            f"{mode:<9}{statistics.median(latencies) * 1e3:>11.1f}"
+            f"{percentile(latencies, 0.95) * 1e3:>9.1f}{latencies[-1] * 1e3:>9.1f}"
+        )
+    server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--api-delay", type=float, default=20, help="milliseconds")
+    parser.add_argument("--rate", type=float, default=20, help="updates per second, 0 for sequential")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""Shared by the benchmark scripts"""
+
+# Any token works against the stubs and the fake Bot API
+TOKEN = "123456:bench"
+
+
+def percentile(sorted_values, fraction):
+    """Value below which `fraction` of the sorted values fall"""
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
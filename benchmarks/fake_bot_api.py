@@ -0,0 +1,222 @@
+"""
+Local stand-in for api.telegram.org, for end-to-end load tests of the bot.
+
+Usage (from the repository root):
+    python benchmarks/fake_bot_api.py --port 8081 --latency 20 --error-rate 0.01 --flood-rate 0.01
+
+then start the bot against it:
+    BOT_API_BASE_URL=http://127.0.0.1:8081/bot BOT_TOKEN=123456:test python Telegram_Bot.py
+
+It speaks the part of the Bot API the bot uses under load: getUpdates
+(long polling with offsets, so nothing is lost on a failed poll),
+sendMessage, sendVideo, sendDocument (file_id or multipart upload) and
+deleteMessage. Other methods (getMe, setWebhook, deleteWebhook, ...)
+answer with just enough to let the bot start. Updates are queued by
+POSTing their JSON to /updates, or by FakeBotApi.push_update() when it
+runs in-process as in bench_end_to_end.py and bench_webhook_latency.py;
+FakeBotApi.reply_for() then gives the time the bot's answer arrived.
+
+Every answer waits --latency ms plus up to --jitter ms. The methods above
+then fail with probability --error-rate (500 Internal Server Error) or
+--flood-rate (429 Too Many Requests with retry_after=--retry-after), the
+way Telegram answers them.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import random
+import time
+
+import tornado.web
+
+API_PORT = 8081
+# Methods that get the injected errors and 429s
+FAULT_METHODS = {"getUpdates", "sendMessage", "sendVideo", "sendDocument", "deleteMessage"}
+# Methods that answer a user, and resolve reply_for()
+REPLY_METHODS = {"sendMessage", "sendVideo", "sendDocument", "deleteMessage"}
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, description, parameters=None):
+        super().__init__(description)
+        self.status = status
+        self.description = description
+        self.parameters = parameters
+
+
+class FakeBotApi:
+    """Bot API state: the update queue, counters and the injected faults"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, flood_rate=0.0, retry_after=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.updates = collections.deque()
+        self.next_update_id = 1
+        self.arrived = asyncio.Event()
+        self.polled = asyncio.Event()
+        self.message_id = 0
+        self.file_id = 0
+        # Calls by method, plus "429", "error" and "upload bytes"
+        self.counts = collections.Counter()
+        # Holds chat_id -> future of the next reply to that chat
+        self.replies = {}
+
+    def reply_for(self, chat_id):
+        """Future set to the perf_counter() time of the next successful reply to chat_id"""
+        self.replies[chat_id] = asyncio.get_running_loop().create_future()
+        return self.replies[chat_id]
+
+    def push_update(self, update):
+        """Queues an update ({"message": ...} or similar) and returns its update_id"""
+        update = dict(update, update_id=self.next_update_id)
+        self.next_update_id += 1
+        self.updates.append(update)
+        self.arrived.set()
+        return update["update_id"]
+
+    async def call(self, method, params, files):
+        self.counts[method] += 1
+        if method == "getUpdates":
+            updates = await self.get_updates(
+                int(params.get("offset", 0)), int(params.get("limit", 100)), float(params.get("timeout", 0))
+            )
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        if method in FAULT_METHODS:
+            draw = random.random()
+            if draw < self.flood_rate:
+                self.counts["429"] += 1
+                raise ApiError(
+                    429, f"Too Many Requests: retry after {self.retry_after}", {"retry_after": self.retry_after}
+                )
+            if draw < self.flood_rate + self.error_rate:
+                self.counts["error"] += 1
+                raise ApiError(500, "Internal Server Error")
+        if method == "getUpdates":
+            return updates
+        if method == "getMe":
+            return BOT_USER
+        if method in ("sendMessage", "sendVideo", "sendDocument"):
+            result = self.make_message(method, params, files)
+        else:
+            result = True
+        if method in REPLY_METHODS:
+            future = self.replies.pop(int(params["chat_id"]), None)
+            if future is not None and not future.done():
+                future.set_result(time.perf_counter())
+        return result
+
+    async def get_updates(self, offset, limit, timeout):
+        # Telegram forgets the updates below offset once they are confirmed
+        while self.updates and self.updates[0]["update_id"] < offset:
+            self.updates.popleft()
+        self.polled.set()
+        if not self.updates and timeout:
+            self.arrived.clear()
+            try:
+                async with asyncio.timeout(timeout):
+                    await self.arrived.wait()
+            except TimeoutError:
+                pass
+        return [update for _, update in zip(range(limit), self.updates)]
+
+    def make_message(self, method, params, files):
+        self.message_id += 1
+        chat_id = int(params["chat_id"])
+        message = {
+            "message_id": self.message_id, "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+        }
+        if method == "sendMessage":
+            message["text"] = params.get("text", "")
+            return message
+        kind = "video" if method == "sendVideo" else "document"
+        for upload in files.get(kind, []):
+            self.counts["upload bytes"] += len(upload.body)
+        sent = params.get(kind)
+        if not isinstance(sent, str) or sent.startswith("attach://"):
+            # An upload gets a new file_id, a file_id is sent as it is
+            self.file_id += 1
+            sent = f"{kind}{self.file_id}"
+        message[kind] = {"file_id": sent, "file_unique_id": sent}
+        if kind == "video":
+            message[kind].update(width=1280, height=720, duration=60)
+        message["caption"] = params.get("caption", "")
+        return message
+
+    def close(self):
+        """Lets a pending long poll return, e.g. the one left by a stopped updater"""
+        self.arrived.set()
+
+
+class ApiHandler(tornado.web.RequestHandler):
+    def initialize(self, api):
+        self.api = api
+
+    async def post(self, token, method):
+        if self.request.headers.get("Content-Type", "").startswith("application/json"):
+            params = json.loads(self.request.body or b"{}")
+        else:
+            params = {name: self.get_body_argument(name) for name in self.request.body_arguments}
+        try:
+            self.write({"ok": True, "result": await self.api.call(method, params, self.request.files)})
+        except ApiError as e:
+            self.set_status(e.status)
+            answer = {"ok": False, "error_code": e.status, "description": e.description}
+            if e.parameters:
+                answer["parameters"] = e.parameters
+            self.write(answer)
+
+    get = post
+
+
+class UpdatesHandler(tornado.web.RequestHandler):
+    def initialize(self, api):
+        self.api = api
+
+    def post(self):
+        self.write({"update_id": self.api.push_update(json.loads(self.request.body))})
+
+
+def make_app(api):
+    return tornado.web.Application([
+        (r"/bot([^/]+)/(\w+)", ApiHandler, {"api": api}),
+        (r"/updates", UpdatesHandler, {"api": api}),
+    ])
+
+
+async def serve(args):
+    logging.getLogger("tornado.access").setLevel(logging.WARNING)
+    api = FakeBotApi(
+        args.latency / 1000, args.jitter / 1000, args.error_rate, args.flood_rate, args.retry_after
+    )
+    make_app(api).listen(args.port, address=args.listen)
+    print(f"Fake Bot API on http://{args.listen}:{args.port}/bot, updates go to /updates")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(dict(api.counts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--listen", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--latency", type=float, default=0, help="milliseconds added to every answer")
+    parser.add_argument("--jitter", type=float, default=0, help="up to this many more milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="share of 500 answers")
+    parser.add_argument("--flood-rate", type=float, default=0, help="share of 429 answers")
+    parser.add_argument("--retry-after", type=int, default=1, help="seconds, sent with the 429s")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
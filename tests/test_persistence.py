@@ -0,0 +1,61 @@
+"""
+Crash recovery of BatchedUserDataPersistence: what one batch wrote must be
+there for the next process, even if the old one never called flush().
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Telegram_Bot as bot  # noqa: E402
+
+REPORTING = {"state": "WAITING_FOR_PHONE", "temp_name": "Abebe Kebede", "report_issue_type": "Blocked User/Account"}
+
+
+async def write_one_batch(persistence, user_id, data):
+    """What PTB does on a persistence run, then wait for the writer task"""
+    await persistence.update_user_data(user_id, data)
+    await persistence.writer
+
+
+def test_user_data_survives_a_crash(tmp_path):
+    path = str(tmp_path / "user_data.sqlite3")
+
+    async def crashed_run():
+        persistence = bot.BatchedUserDataPersistence(path, 10)
+        await write_one_batch(persistence, 7, REPORTING)
+        # Changed after the last batch and never flushed: lost with the process
+        await persistence.update_user_data(8, {"state": "WAITING_FOR_NAME"})
+        persistence.writer.cancel()
+        # No flush(), no close: the process just dies
+
+    async def next_run():
+        return await bot.BatchedUserDataPersistence(path, 10).get_user_data()
+
+    asyncio.run(crashed_run())
+    assert asyncio.run(next_run()) == {7: REPORTING}
+
+
+def test_failed_write_is_kept_for_the_next_batch(tmp_path):
+    path = str(tmp_path / "user_data.sqlite3")
+
+    async def run():
+        persistence = bot.BatchedUserDataPersistence(path, 10)
+        write_batch = persistence.write_batch
+
+        def failing_write(batch):
+            persistence.write_batch = write_batch
+            raise OSError("disk I/O error")
+
+        persistence.write_batch = failing_write
+        await write_one_batch(persistence, 7, REPORTING)
+        assert persistence.dirty == {7: json.dumps(REPORTING)}
+        await write_one_batch(persistence, 8, {"search_category": "Blocked_Users"})
+        return await bot.BatchedUserDataPersistence(path, 10).get_user_data()
+
+    assert asyncio.run(run()) == {7: REPORTING, 8: {"search_category": "Blocked_Users"}}